@@ -0,0 +1,38 @@
+'''Synthetic maps for benchmarks, built by tiling data/map.txt.'''
+
+# core
+import os
+import random
+
+# local
+from gamelib import settings
+
+
+def load_source(path=None):
+    with open(path or os.path.join(settings.DATA_DIR, 'map.txt')) as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+
+def scaled_map(scale_x=1, scale_y=1, enemy_density=0.0, seed=0, source=None):
+    """Return map text with the source map repeated scale_x by scale_y times.
+
+    enemy_density is the chance of turning each free ground cell into an
+    extra enemy spawn, on top of the enemies the source map already has.
+    """
+    rows = load_source(source)
+    width = max(len(row) for row in rows)
+    rows = [row.ljust(width, '#') for row in rows]
+    rows = [row * scale_x for row in rows] * scale_y
+
+    rng = random.Random(seed)
+    if enemy_density:
+        rows = [''.join('E' if c == ' ' and rng.random() < enemy_density else c for c in row)
+                for row in rows]
+    return '\n'.join(rows) + '\n'
+
+
+def write_map(path, *args, **kwargs):
+    text = scaled_map(*args, **kwargs)
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
@@ -0,0 +1,219 @@
+'''Headless benchmark of map loading, simulation and drawing.
+
+Usage:
+
+  python -m benchmarks.run --scale 2 --enemy-density 0.02 --frames 600 --json out.json
+
+Every run generates a synthetic map (see benchmarks/mapgen.py), loads it in
+a headless game and steps it for a number of frames with a scripted player,
+timing each hot path separately. The map is compiled into a throwaway level
+cache and loaded once more from it, to time both the cold and warm load.
+Memory is reported as the number of gc tracked objects and the max RSS
+(where the resource module exists) before and after the run; Python 2
+has no tracemalloc, so there are no per phase allocation counts.
+
+A recorded session (python run_game.py --record session.rec) can be
+replayed on data/map.txt instead, to compare frame times across builds:
+
+  python -m benchmarks.run --replay session.rec --json out.json
+'''
+
+# core
+import argparse
+import gc
+import json
+import os
+import shutil
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# 3rd party
+import pygame as pg
+
+# local
+from benchmarks import mapgen
+from gamelib import assets
+from gamelib import level
+from gamelib import main
+from gamelib import masks
+from gamelib import recording
+from gamelib import settings
+from gamelib.ai import EnemyAI
+from gamelib.enemies import EnemyStore
+from gamelib.game import Game, Inputs, Player
+from gamelib.profiler import FrameProfiler
+
+
+# (owner, method name, label) of every timed hot path
+PHASES = [
+    (Game, 'load_map', 'load_map'),
+    (Game, 'step', 'step'),
+    (Game, 'update', 'Game.update'),
+    (EnemyAI, 'update', 'EnemyAI.update'),
+    (Game, 'draw', 'Game.draw'),
+    (Player, 'movement', 'Player.movement'),
+    (EnemyStore, 'update', 'EnemyStore.update'),
+]
+
+
+class PhaseTimer(object):
+    """Wraps methods in place and accumulates their call counts and time."""
+
+    def __init__(self):
+        self.totals = {}
+        self.calls = {}
+        self.patched = []
+
+    def wrap(self, owner, name, label):
+        original = owner.__dict__[name]
+        totals, calls = self.totals, self.calls
+        totals[label] = 0.0
+        calls[label] = 0
+
+        def timed(*args, **kwargs):
+            start = time.time()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                totals[label] += time.time() - start
+                calls[label] += 1
+
+        setattr(owner, name, timed)
+        self.patched.append((owner, name, original))
+
+    def restore(self):
+        for owner, name, original in reversed(self.patched):
+            setattr(owner, name, original)
+        self.patched = []
+
+    def report(self):
+        return dict((label, {'calls': self.calls[label],
+                             'total_ms': self.totals[label] * 1000,
+                             'mean_ms': self.totals[label] * 1000 / max(1, self.calls[label])})
+                    for label in self.totals)
+
+
+def scripted_inputs(game, tick):
+    # walk in a square and keep the trigger pulled, so bullets are in play
+    directions = [pg.K_d, pg.K_s, pg.K_a, pg.K_w]
+    game.player.weapon = True
+    game.player.bullets_left = game.player.max_bullets
+    return Inputs(directions=[directions[(tick // 90) % 4]],
+                  fire=tick % 10 == 0,
+                  confirm=True)
+
+
+def memory_usage():
+    usage = {'gc_objects': len(gc.get_objects())}
+    if resource:
+        usage['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage
+
+
+def time_level_load(map_path, cache_dir):
+    """Milliseconds to compile the map into an empty cache, then to map it."""
+    times = {}
+    for label in ('cold_ms', 'warm_ms'):
+        start = time.time()
+        level_data = level.load(map_path, cache_dir)
+        times[label] = (time.time() - start) * 1000
+    return level_data, times
+
+
+def run(scale=1, enemy_density=0.0, frames=600, dt=1/60.0, draw=True, seed=0, replay=None):
+    main.init(headless=True)
+    # the synthetic map and its compiled level never leave this directory
+    temp_dir = tempfile.mkdtemp()
+    if replay:
+        session = recording.read(replay)
+        frames = len(session.steps)
+        dt = 1.0 / session.tick_rate
+        map_path = settings.MAP_PATH
+    else:
+        session = None
+        map_path = os.path.join(temp_dir, 'map.txt')
+        mapgen.write_map(map_path, scale, scale, enemy_density, seed)
+
+    timer = PhaseTimer()
+    for owner, name, label in PHASES:
+        timer.wrap(owner, name, label)
+    memory_before = memory_usage()
+    game = None
+    try:
+        level_data, level_times = time_level_load(map_path, os.path.join(temp_dir, 'cache'))
+        game = Game(seed=session.seed) if session else Game()
+        game.profiler = FrameProfiler(window=max(1, frames))
+        game.start(level_data=level_data)
+        started = time.time()
+        ticks = 0
+        while ticks < frames and not game.done:
+            game.profiler.begin_frame()
+            if session:
+                game.step(session.steps[ticks], dt)
+            else:
+                game.step(scripted_inputs(game, ticks), dt)
+            if draw:
+                game.draw()
+            ticks += 1
+        game.profiler.begin_frame()
+        elapsed = time.time() - started
+        memory_after = memory_usage()
+    finally:
+        if game:
+            game.close()
+        timer.restore()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return {
+        'map': {'scale': scale, 'enemy_density': enemy_density, 'seed': seed,
+                'columns': game.grid.columns, 'rows': game.grid.rows,
+                'blocks': int((game.level.tiles == level.BLOCK).sum()),
+                'enemies': sum(1 for spawn in game.level.spawns if spawn[0] == 'E'),
+                'active_enemies': len(game.enemies)},
+        'level_load': level_times,
+        'replay': replay,
+        'frames': ticks,
+        'frame_ms': game.profiler.stats()['frame'],
+        'seconds': elapsed,
+        'fps': ticks / elapsed if elapsed else 0.0,
+        'phases': timer.report(),
+        'assets': assets.cache.stats(),
+        'masks': masks.cache.stats(),
+        'memory': {'before': memory_before, 'after': memory_after},
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=1, help='repeat data/map.txt N by N times')
+    parser.add_argument('--enemy-density', type=float, default=0.0, help='extra enemies per free cell')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-draw', action='store_true', help='only time the simulation')
+    parser.add_argument('--replay', help='replay this recording on data/map.txt instead')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    result = run(args.scale, args.enemy_density, args.frames, draw=not args.no_draw, seed=args.seed,
+                 replay=args.replay)
+    print('%(frames)d frames in %(seconds).2fs, %(fps).1f fps' % result)
+    print('  frame ms: p50 %(p50).2f  p95 %(p95).2f  p99 %(p99).2f  max %(max).2f' % result['frame_ms'])
+    print('  level load: %(cold_ms).2f ms compiled, %(warm_ms).2f ms cached' % result['level_load'])
+    print('  assets: %(images)d images, %(hits)d hits, %(misses)d misses' % result['assets'])
+    print('  masks: %(builds)d built, %(hits)d shared' % result['masks'])
+    for label, phase in sorted(result['phases'].items()):
+        print('  %-28s %8d calls %10.2f ms total %8.3f ms mean' % (
+            label, phase['calls'], phase['total_ms'], phase['mean_ms']))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+    pg.quit()
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,92 @@
+# core
+import math
+
+# 3rd party
+import numpy as np
+
+# local
+import settings
+from enemies import SIZE
+
+
+DISTANCE = 300  # how far enemies see
+MARGIN = 100    # half width of the vision cone
+RELOAD = 200    # milliseconds between two shots of one enemy
+SLACK = 1e-6    # milliseconds, absorbs the rounding of summed step times
+
+# Vision cone (x, y, width, height) relative to the enemy topleft, by heading
+# (w, a, s, d, see enemies.DIRECTIONS).
+CONES = np.array([(-MARGIN / 2, -DISTANCE, MARGIN * 2, DISTANCE),
+                  (-DISTANCE, -MARGIN / 2, DISTANCE, MARGIN * 2),
+                  (-MARGIN / 2, 0, MARGIN * 2, DISTANCE),
+                  (0, -MARGIN / 2, DISTANCE, MARGIN * 2)], dtype=np.int32)
+
+
+class EnemyAI(object):
+    """Enemy vision and shooting, evaluated for all enemies at once.
+
+    An enemy shoots when the player is within DISTANCE, inside its vision
+    cone and no block is in between. Runs at `rate` updates per second of
+    game time (0 runs it on every step), independent of what is on screen.
+    """
+
+    def __init__(self, store, grid, rate=settings.AI_RATE):
+        self.store = store
+        self.grid = grid
+        self.period = 1000.0 / rate if rate else 0.0
+        self.last_run = None
+
+    def update(self, enemies, player_rect, now):
+        """Return (location, angle) of every shot fired."""
+        if self.last_run is None:
+            self.last_run = now
+        elif now - self.last_run < self.period - SLACK:
+            return []
+        else:
+            # keep to the schedule, unless it fell a whole period behind
+            self.last_run += self.period
+            if now - self.last_run >= self.period:
+                self.last_run = now
+        if not enemies:
+            return []
+
+        store = self.store
+        slots = np.array([enemy.slot for enemy in enemies])
+        pos = store.pos[slots]
+        delta = np.array(player_rect.topleft) - pos
+        near = (delta ** 2).sum(axis=1) < DISTANCE ** 2
+
+        cone = CONES[store.heading[slots]]
+        cone[:, :2] += pos
+        in_cone = ((cone[:, 0] < player_rect.right) & (cone[:, 0] + cone[:, 2] > player_rect.left) &
+                   (cone[:, 1] < player_rect.bottom) & (cone[:, 1] + cone[:, 3] > player_rect.top))
+
+        ready = now - store.shooting_time[slots] > RELOAD
+        candidates = np.flatnonzero(near & in_cone & ready)
+        if not len(candidates):
+            return []
+        candidates = candidates[self.line_of_sight(pos[candidates], player_rect.center)]
+
+        shots = []
+        for i in candidates.tolist():
+            store.shooting_time[slots[i]] = now
+            dx = pos[i, 0] - player_rect.x
+            dy = pos[i, 1] - player_rect.y
+            rads = math.atan2(-dy, dx)
+            rads %= 2*math.pi
+            angle = math.degrees(rads) - 40
+            shots.append(((int(pos[i, 0]) + SIZE[0] // 2, int(pos[i, 1]) + SIZE[1] // 2), angle))
+        return shots
+
+    def line_of_sight(self, pos, target):
+        """True for every enemy (by topleft) with no block between it and target."""
+        grid = self.grid
+        start = pos + np.array(SIZE) // 2
+        span = np.array(target) - start
+        # sample the segments every half tile, enough to never skip a tile
+        samples = int(DISTANCE * 2 / grid.tile_size) + 2
+        t = np.linspace(0.0, 1.0, samples)
+        points = start[:, None, :] + span[:, None, :] * t[None, :, None]
+        columns = np.clip(points[..., 0] // grid.tile_size, 0, grid.columns - 1).astype(np.int32)
+        rows = np.clip(points[..., 1] // grid.tile_size, 0, grid.rows - 1).astype(np.int32)
+        return ~grid.occupied[rows, columns].any(axis=1)
@@ -0,0 +1,60 @@
+'''Sprite sheet animations.
+
+Every clip is cut from its sheet once into the shared atlas, and the frame
+an entity shows is worked out from the game clock instead of a timer kept
+by every entity.
+'''
+
+# local
+import assets
+
+
+# clip id -> (sheet, frame size, frame count, frames per second)
+CLIPS = {
+    'player': ('player_no_weapon.png', (50, 50), 4, 7.0),
+    'player_armed': ('player_with_weapon.png', (50, 50), 4, 7.0),
+    'enemy1': ('enemy1.png', (50, 50), 4, 7.0),
+    'enemy2': ('enemy2.png', (50, 50), 4, 7.0),
+    'enemy3': ('enemy3.png', (50, 50), 4, 7.0),
+}
+
+
+def frame_index(now, fps, count, phase=0):
+    """Frame shown at `now` milliseconds of a looping clip.
+
+    Works on NumPy arrays as well, phase shifts the loop per entity.
+    """
+    return (int(now * fps / 1000.0) + phase) % count
+
+
+class Clip(object):
+    def __init__(self, frames, fps):
+        self.frames = frames
+        self.fps = fps
+
+    def frame(self, now, phase=0):
+        return self.frames[frame_index(now, self.fps, len(self.frames), phase)]
+
+
+class FrameAtlas(object):
+    """Cuts every clip out of its sheet the first time it is asked for."""
+
+    def __init__(self, specs=CLIPS):
+        self.specs = specs
+        self.clips = {}
+
+    def clip(self, clip_id):
+        clip = self.clips.get(clip_id)
+        if clip is None:
+            sheet_name, size, count, fps = self.specs[clip_id]
+            sheet = assets.image(sheet_name)
+            frames = [sheet.subsurface(((size[0] * i, 0), size)) for i in range(count)]
+            clip = self.clips[clip_id] = Clip(frames, fps)
+        return clip
+
+
+atlas = FrameAtlas()
+
+
+def clip(clip_id):
+    return atlas.clip(clip_id)
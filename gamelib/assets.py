@@ -0,0 +1,155 @@
+# core
+import threading
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+# 3rd party
+import pygame as pg
+
+# local
+import settings
+
+
+COLOR_KEY = (255, 0, 255)
+
+# Conversion modes understood by the cache.
+ALPHA = 'alpha'         # convert_alpha()
+OPAQUE = 'opaque'       # convert()
+COLORKEY = 'colorkey'   # convert() + set_colorkey(COLOR_KEY)
+
+PRELOAD = [
+    ('block.png', ALPHA),
+    ('bullet.png', COLORKEY),
+    ('star.png', ALPHA),
+    ('weapon.png', ALPHA),
+    ('notification1.png', ALPHA),
+    ('notification2.png', ALPHA),
+    ('ground1.png', ALPHA),
+    ('ground2.png', ALPHA),
+    ('ground3.png', ALPHA),
+    ('ground4.png', ALPHA),
+    ('ground5.png', ALPHA),
+    ('ground6.png', ALPHA),
+    ('enemy1.png', ALPHA),
+    ('enemy2.png', ALPHA),
+    ('enemy3.png', ALPHA),
+    ('player_no_weapon.png', ALPHA),
+    ('player_with_weapon.png', ALPHA),
+    ('life.png', ALPHA),
+    ('life_bar.png', ALPHA),
+    ('game_opening.png', ALPHA),
+    ('game_over.png', ALPHA),
+]
+
+
+class AssetCache(object):
+    """Loads every image once per (path, mode) and hands out the shared Surface.
+
+    Surfaces returned from the cache are shared between all callers, so
+    anything that needs to draw onto an image must work on a copy.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.images = {}
+        self.hits = 0
+        self.misses = 0
+
+    def image(self, name, mode=ALPHA):
+        key = (name, mode)
+        image = self.images.get(key)
+        if image is not None:
+            self.hits += 1
+            return image
+        self.misses += 1
+        image = self.images[key] = self.load(name, mode)
+        return image
+
+    def load(self, name, mode):
+        return self.convert(self.decode(name), mode)
+
+    def decode(self, name):
+        # safe to call from any thread, unlike convert()
+        return pg.image.load(self.directory + "/" + name)
+
+    def add(self, name, mode, image):
+        """Convert a decoded image and store it under (name, mode)."""
+        self.images[(name, mode)] = self.convert(image, mode)
+
+    def convert(self, image, mode):
+        if mode == ALPHA:
+            return image.convert_alpha()
+        image = image.convert()
+        if mode == COLORKEY:
+            image.set_colorkey(COLOR_KEY)
+        return image
+
+    def stats(self):
+        return {'images': len(self.images), 'hits': self.hits, 'misses': self.misses}
+
+
+class Preloader(object):
+    """Decodes images on a worker thread while the main thread keeps drawing.
+
+    Conversion needs the display, so poll() moves the decoded images into
+    the cache on the main thread. `jobs` are (key, callable) pairs run on
+    the worker after the images, with their results kept in `results`.
+    """
+
+    def __init__(self, cache, names=PRELOAD, jobs=()):
+        self.cache = cache
+        self.names = [(name, mode) for name, mode in names if (name, mode) not in cache.images]
+        self.jobs = list(jobs)
+        self.results = {}
+        self.total = len(self.names) + len(self.jobs)
+        self.done = 0
+        self.loaded = queue.Queue()
+        self.thread = threading.Thread(target=self.work)
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def work(self):
+        try:
+            for name, mode in self.names:
+                self.loaded.put((name, mode, self.cache.decode(name)))
+            for key, job in self.jobs:
+                self.loaded.put((key, None, job()))
+        except Exception as error:
+            self.loaded.put((None, None, error))
+
+    def poll(self):
+        """Take in everything loaded so far, True once all is done."""
+        while True:
+            try:
+                key, mode, value = self.loaded.get_nowait()
+            except queue.Empty:
+                break
+            if key is None:
+                raise value  # the worker failed, fail here instead
+            if mode is None:
+                self.results[key] = value
+            else:
+                self.cache.add(key, mode, value)
+            self.done += 1
+        return self.done == self.total
+
+    def finish(self):
+        self.thread.join()
+        self.poll()
+        return self.results
+
+    def progress(self):
+        return float(self.done) / self.total if self.total else 1.0
+
+
+cache = AssetCache(settings.IMG_DIR)
+
+
+def image(name, mode=ALPHA):
+    return cache.image(name, mode)
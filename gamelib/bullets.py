@@ -0,0 +1,127 @@
+# core
+import math
+
+# 3rd party
+import numpy as np
+
+
+PLAYER = 0
+ENEMY = 1
+
+
+class BulletPool(object):
+    """Every bullet in flight, stored as parallel NumPy arrays.
+
+    Bullets are moved, culled and tested for hits in batched array
+    operations instead of one Python-level sprite per shot. A bullet's rect
+    is the bounding box of its rotated image, as it was for the old sprites.
+    """
+
+    def __init__(self, image, rotations, speed=900, capacity=64):
+        self.rotations = rotations
+        self.images = rotations.prepare(image)
+        self.sizes = np.array([img.get_size() for img in self.images], dtype=np.int32)
+        self.speed = speed  # pixels per second
+        self.count = 0
+        self.pos = np.zeros((capacity, 2))        # rect topleft
+        self.previous = np.zeros((capacity, 2))   # rect topleft before the last step
+        self.velocity = np.zeros((capacity, 2))
+        self.size = np.zeros((capacity, 2), dtype=np.int32)
+        self.bucket = np.zeros(capacity, dtype=np.int32)
+        self.owner = np.zeros(capacity, dtype=np.int8)
+
+    def __len__(self):
+        return self.count
+
+    def grow(self):
+        capacity = len(self.pos) * 2
+        for name in ('pos', 'previous', 'velocity', 'size', 'bucket', 'owner'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def fire(self, location, angle, owner):
+        if self.count == len(self.pos):
+            self.grow()
+        i = self.count
+        bucket = self.rotations.bucket(angle)
+        w, h = self.sizes[bucket]
+        rads = -math.radians(angle-135)
+        self.pos[i] = (location[0] - w // 2, location[1] - h // 2)
+        self.previous[i] = self.pos[i]
+        self.velocity[i] = (self.speed*math.cos(rads), self.speed*math.sin(rads))
+        self.size[i] = (w, h)
+        self.bucket[i] = bucket
+        self.owner[i] = owner
+        self.count += 1
+
+    def rects(self):
+        # left, top, right, bottom of every live bullet, in whole pixels
+        topleft = self.pos[:self.count].astype(np.int32)
+        return np.hstack((topleft, topleft + self.size[:self.count]))
+
+    def remove(self, dead):
+        keep = ~dead
+        count = int(keep.sum())
+        if count == self.count:
+            return
+        for array in (self.pos, self.previous, self.velocity, self.size, self.bucket, self.owner):
+            array[:count] = array[:self.count][keep]
+        self.count = count
+
+    def snapshot(self):
+        self.previous[:self.count] = self.pos[:self.count]
+
+    def update(self, bounds, dt):
+        """Move every bullet by dt seconds and drop the ones outside bounds."""
+        n = self.count
+        self.pos[:n] += self.velocity[:n] * dt
+        r = self.rects()
+        outside = ((r[:, 2] <= bounds.left) | (r[:, 0] >= bounds.right) |
+                   (r[:, 3] <= bounds.top) | (r[:, 1] >= bounds.bottom))
+        self.remove(outside)
+
+    def collide_grid(self, grid):
+        """Remove bullets overlapping an occupied tile."""
+        if not self.count:
+            return
+        r = self.rects()
+        size = grid.tile_size
+        columns = np.clip(np.stack((r[:, 0], r[:, 2] - 1)) // size, 0, grid.columns - 1)
+        rows = np.clip(np.stack((r[:, 1], r[:, 3] - 1)) // size, 0, grid.rows - 1)
+        # bullets are smaller than a tile, so testing the four corners is enough
+        hit = (grid.occupied[rows[0], columns[0]] | grid.occupied[rows[0], columns[1]] |
+               grid.occupied[rows[1], columns[0]] | grid.occupied[rows[1], columns[1]])
+        self.remove(hit)
+
+    def collide_rects(self, rects, owner):
+        """Remove bullets fired by owner that overlap any of rects.
+
+        Returns how many bullets hit each rect.
+        """
+        if not self.count or not len(rects):
+            return np.zeros(len(rects), dtype=np.int32)
+        targets = np.array([(r.left, r.top, r.right, r.bottom) for r in rects], dtype=np.int32)
+        r = self.rects()
+        overlap = ((r[:, None, 0] < targets[None, :, 2]) & (r[:, None, 2] > targets[None, :, 0]) &
+                   (r[:, None, 1] < targets[None, :, 3]) & (r[:, None, 3] > targets[None, :, 1]))
+        overlap &= (self.owner[:self.count] == owner)[:, None]
+        self.remove(overlap.any(axis=1))
+        return overlap.sum(axis=0)
+
+    def draw(self, surface, camera, alpha=1.0):
+        """Draw every bullet alpha of the way from its previous position."""
+        if not self.count:
+            return
+        previous = self.previous[:self.count]
+        x = (previous + (self.pos[:self.count] - previous) * alpha).astype(np.int32)
+        x[:, 0] += camera.state.x
+        x[:, 1] += camera.state.y
+        size = self.size[:self.count]
+        w, h = surface.get_size()
+        visible = np.flatnonzero((x[:, 0] + size[:, 0] > 0) & (x[:, 0] < w) &
+                                 (x[:, 1] + size[:, 1] > 0) & (x[:, 1] < h))
+        images = self.images
+        for i in visible:
+            surface.blit(images[self.bucket[i]], (int(x[i, 0]), int(x[i, 1])))
@@ -0,0 +1,118 @@
+# 3rd party
+import numpy as np
+
+
+class ComponentArray(object):
+    """Dense storage of one component type.
+
+    Rows 0..count-1 hold the values of `count` entities with no gaps, so
+    systems can work on whole arrays. Removing an entity moves the last row
+    into its place, which keeps removal O(1) but does not keep order.
+    """
+
+    def __init__(self, dtype, width=1, capacity=16):
+        self.width = width
+        self.count = 0
+        self.data = np.zeros(self.shape(capacity), dtype=dtype)
+        self.entities = np.zeros(capacity, dtype=np.int64)
+        self.rows = {}  # entity -> row
+
+    def shape(self, capacity):
+        return (capacity, self.width) if self.width > 1 else (capacity,)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, entity):
+        return entity in self.rows
+
+    def add(self, entity, value):
+        if self.count == len(self.entities):
+            capacity = len(self.entities) * 2
+            data = np.zeros(self.shape(capacity), dtype=self.data.dtype)
+            data[:self.count] = self.data
+            self.data = data
+            self.entities = np.resize(self.entities, capacity)
+        row = self.rows[entity] = self.count
+        self.data[row] = value
+        self.entities[row] = entity
+        self.count += 1
+
+    def remove(self, entity):
+        row = self.rows.pop(entity)
+        last = self.count - 1
+        if row != last:
+            self.data[row] = self.data[last]
+            moved = int(self.entities[last])
+            self.entities[row] = moved
+            self.rows[moved] = row
+        if self.data.dtype == object:
+            self.data[last] = None  # do not keep the value alive
+        self.count = last
+
+    def get(self, entity):
+        return self.data[self.rows[entity]]
+
+    def values(self):
+        return self.data[:self.count]
+
+    def ids(self):
+        return self.entities[:self.count]
+
+
+class World(object):
+    """Entities with typed component arrays, updated by ordered systems.
+
+    Entity ids are never reused. Entities created or destroyed while the
+    systems run only appear or disappear at the next flush(), which run()
+    does once all systems are done, so systems can iterate without copies.
+    """
+
+    def __init__(self):
+        self.components = {}  # name -> ComponentArray
+        self.systems = []  # callables taking (world, *args), in run order
+        self.next_id = 1
+        self.alive = set()
+        self.created = []  # (entity, components) waiting for flush()
+        self.destroyed = []
+
+    def register(self, name, dtype, width=1):
+        self.components[name] = ComponentArray(dtype, width)
+
+    def add_system(self, system):
+        self.systems.append(system)
+
+    def __getitem__(self, name):
+        return self.components[name]
+
+    def __len__(self):
+        return len(self.alive)
+
+    def create(self, **components):
+        entity = self.next_id
+        self.next_id += 1
+        self.created.append((entity, components))
+        return entity
+
+    def destroy(self, entity):
+        self.destroyed.append(entity)
+
+    def flush(self):
+        created, self.created = self.created, []
+        for entity, components in created:
+            self.alive.add(entity)
+            for name, value in components.items():
+                self.components[name].add(entity, value)
+        destroyed, self.destroyed = self.destroyed, []
+        for entity in destroyed:
+            if entity not in self.alive:
+                continue  # destroyed twice in one tick
+            self.alive.remove(entity)
+            for component in self.components.values():
+                if entity in component:
+                    component.remove(entity)
+
+    def run(self, *args):
+        for system in self.systems:
+            system(self, *args)
+        self.flush()
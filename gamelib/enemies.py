@@ -0,0 +1,190 @@
+# 3rd party
+import numpy as np
+import pygame as pg
+
+# local
+import animation
+from render import RotationCache
+
+
+SIZE = (50, 50)
+SPEED = 100  # pixels per second
+ANIMATE_FPS = 7.0  # as the enemy clips in animation.CLIPS
+FRAMES = 4
+KINDS = 3  # animation clips enemy1 .. enemy3
+
+# Headings are stored as indices into these.
+DIRECTIONS = [pg.K_w, pg.K_a, pg.K_s, pg.K_d]
+HEADING = dict((key, i) for i, key in enumerate(DIRECTIONS))
+VECTORS = np.array([(0, -1), (-1, 0), (0, 1), (1, 0)], dtype=np.int32)
+
+ENEMY_ANGLES = {pg.K_w: 0,
+                pg.K_a: 90,
+                pg.K_s: 180,
+                pg.K_d: 270}
+
+enemy_rotations = RotationCache(4)  # enemies only ever face the four directions
+
+
+class Enemy(object):
+    """Handle to one enemy in an EnemyStore.
+
+    All state lives in the store arrays; the handle only remembers its slot
+    so that enemies can still be passed around and used as dict keys.
+    """
+
+    __slots__ = ('store', 'slot')
+
+    def __init__(self, store, slot):
+        self.store = store
+        self.slot = slot
+
+    @property
+    def rect(self):
+        x, y = self.store.pos[self.slot]
+        return pg.Rect(int(x), int(y), SIZE[0], SIZE[1])
+
+    def rect_at(self, alpha):
+        """Rect between the previous and the current step, for drawing."""
+        x0, y0 = self.store.previous[self.slot]
+        x, y = self.store.pos[self.slot]
+        return pg.Rect(int(round(x0 + (x - x0) * alpha)), int(round(y0 + (y - y0) * alpha)), SIZE[0], SIZE[1])
+
+    @property
+    def direction(self):
+        return DIRECTIONS[self.store.heading[self.slot]]
+
+    @property
+    def image(self):
+        store = self.store
+        return store.clips[store.kind[self.slot]].frames[store.frame[self.slot]]
+
+    @property
+    def killed(self):
+        return self.store.killed[self.slot]
+
+    @killed.setter
+    def killed(self, value):
+        self.store.killed[self.slot] = value
+
+
+class EnemyStore(object):
+    """Every enemy's state kept in parallel arrays, indexed by slot.
+
+    Slots of removed enemies are reused, so a slot (and its Enemy handle)
+    stays valid for the whole life of an enemy.
+    """
+
+    FIELDS = [('pos', np.int32, 2),            # rect topleft
+              ('previous', np.int32, 2),       # rect topleft before the last step
+              ('remainder', np.float32, 2),    # sub-pixel movement left over
+              ('heading', np.int8, 1),         # index into DIRECTIONS
+              ('frame', np.int8, 1),
+              ('shooting_time', np.float32, 1),
+              ('kind', np.int8, 1),
+              ('alive', bool, 1),
+              ('killed', bool, 1)]
+
+    def __init__(self, capacity=64):
+        self.clips = [animation.clip('enemy%d' % (i + 1)) for i in range(KINDS)]
+        for clip in self.clips:
+            for frame in clip.frames:
+                enemy_rotations.prepare(frame)
+        self.handles = []
+        self.free = []
+        self.capacity = 0
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        for name, dtype, width in self.FIELDS:
+            shape = (capacity, width) if width > 1 else (capacity,)
+            new = self.allocate(name, shape, dtype)
+            if self.capacity:
+                new[:self.capacity] = getattr(self, name)
+            setattr(self, name, new)
+        self.free.extend(range(capacity - 1, self.capacity - 1, -1))
+        self.capacity = capacity
+
+    def allocate(self, name, shape, dtype):
+        return np.zeros(shape, dtype=dtype)
+
+    def spawn(self, center, kind):
+        if not self.free:
+            self.grow(self.capacity * 2)
+        slot = self.free.pop()
+        self.pos[slot] = (center[0] - SIZE[0] // 2, center[1] - SIZE[1] // 2)
+        self.previous[slot] = self.pos[slot]
+        self.remainder[slot] = 0
+        self.heading[slot] = HEADING[pg.K_s]
+        self.frame[slot] = 0
+        self.shooting_time[slot] = 0
+        self.kind[slot] = kind
+        self.alive[slot] = True
+        self.killed[slot] = False
+        while len(self.handles) <= slot:
+            self.handles.append(None)
+        enemy = self.handles[slot] = Enemy(self, slot)
+        return enemy
+
+    def remove(self, enemy):
+        self.alive[enemy.slot] = False
+        self.handles[enemy.slot] = None
+        self.free.append(enemy.slot)
+
+    def snapshot(self):
+        self.previous[:] = self.pos
+
+    def update(self, enemies, navigation, dt, now):
+        """Move and animate a batch of enemies by dt seconds, see advance()."""
+        if enemies:
+            advance(self, np.array([enemy.slot for enemy in enemies]), navigation, dt, now)
+
+
+def advance(store, slots, navigation, dt, now):
+    """Move and animate the enemies in slots of store by dt seconds.
+
+    Enemies only turn when they are aligned with a tile, so they stay in
+    the lanes between blocks and never need collision tests: they chase
+    along the navigation flow field when they are near its target and
+    otherwise walk straight on until a block makes them turn.
+    """
+    tile = navigation.tile_size
+    pos = store.pos[slots]
+    stuck = np.zeros(len(slots), dtype=bool)
+
+    aligned = np.flatnonzero((pos % tile == 0).all(axis=1))
+    if len(aligned):
+        cells = pos[aligned] // tile
+        heading = navigation.headings(cells)
+        patrolling = heading < 0
+        heading[patrolling] = store.heading[slots[aligned]][patrolling]
+        for i in np.flatnonzero(~navigation.is_open(cells, heading)).tolist():
+            turn = navigation.patrol(cells[i], heading[i])
+            if turn < 0:
+                stuck[aligned[i]] = True
+            else:
+                heading[i] = turn
+        store.heading[slots[aligned]] = heading
+
+    remainder = store.remainder[slots] + VECTORS[store.heading[slots]] * (SPEED * dt)
+    fraction = np.fmod(remainder, 1)
+    steps = (remainder - fraction).astype(np.int32)
+    # never step past the next tile boundary, that is where turns happen
+    offset = pos % tile
+    room = np.where(steps > 0, tile - offset, np.where(offset > 0, offset, tile))
+    clipped = np.abs(steps) > room
+    steps[clipped] = (np.sign(steps) * room)[clipped]
+    fraction[clipped] = 0
+    steps[stuck] = 0
+    fraction[stuck] = 0
+    store.remainder[slots] = fraction
+    moving = steps.any(axis=1)
+    slots, steps = slots[moving], steps[moving]
+    if not len(slots):
+        return
+
+    # walking enemies show the frame of the shared clock, shifted by slot so
+    # that they do not all step in time
+    store.frame[slots] = animation.frame_index(now, ANIMATE_FPS, FRAMES, slots)
+
+    store.pos[slots] += steps
@@ -9,10 +9,26 @@ import math
 import pygame as pg
 
 # local
+import assets
+import ai
+import animation
+import bullets
+import ecs
+import enemies
+import grid
+import level
+import masks
+import parallel
+import pickups
 import settings
+from enemies import ENEMY_ANGLES, EnemyStore, enemy_rotations
+from hud import Hud, draw_centered, draw_progress
+from navigation import Navigation
+from profiler import FrameProfiler
+from render import RotationCache, StaticLayer, Viewport, draw_ground
+from world import ChunkedWorld
 
 
-TRANSPARENT = (0, 0, 0, 0)
 COLOR_KEY = (255, 0, 255)
 HALF_WIDTH = 640 / 2
 HALF_HEIGHT = 480 / 2
@@ -22,18 +38,36 @@ DIRECT_DICT = {pg.K_a  : (-1, 0),
                pg.K_w    : (0, -1),
                pg.K_s  : (0, 1)}
 
+RNG_STREAMS = ['spawns', 'patrol']
+
+rotations = RotationCache(settings.ROTATION_STEPS)
+
+
+class Inputs(object):
+    """Player input for one simulation step."""
+
+    def __init__(self, directions=(), mouse=None, fire=False, confirm=False):
+        self.directions = list(directions)  # held direction keys, oldest first
+        self.mouse = mouse                  # mouse position on screen, None if it did not move
+        self.fire = fire                    # fire button pressed this step
+        self.confirm = confirm              # any key pressed, dismisses notifications
+
+    def merge(self, newer):
+        """Combine with the input of a later frame, when no step used this one."""
+        return Inputs(newer.directions, newer.mouse or self.mouse,
+                      self.fire or newer.fire, self.confirm or newer.confirm)
+
 
 class Player(pg.sprite.Sprite):
     def __init__(self, rect, speed, direction=pg.K_d):
         pg.sprite.Sprite.__init__(self)
         self.rect = pg.Rect(rect)
+        self.hitbox = pg.Rect(5, 5, 40, 40)  #Solid part of the rect, relative to its topleft.
         self.remainder = [0, 0]  #Adjust rect in integers; save remainders.
-        self.mask = self.make_mask()
+        self.mask = masks.hitbox(self.rect.size, self.hitbox)
         self.speed = speed  #Pixels per second; not pixels per frame.
         self.direction = direction
-        self.old_direction = None  #The Players previous direction every frame.
         self.direction_stack = []  #Held keys in the order they were pressed.
-        self.redraw = False  #Force redraw if needed.
         self.image = None
         self.angle = -math.radians(135)
         self.lifes = 6
@@ -42,42 +76,17 @@ class Player(pg.sprite.Sprite):
         self.bullets_left = 0
         self.max_bullets = 8
 
-        self.sprites = pg.image.load(settings.IMG_DIR + "/player_no_weapon.png").convert_alpha()
-
-        self.frame  = 0
-        self.frames = self.get_frames()
-        self.animate_timer = 0.0
-        self.animate_fps = 7.0
-        self.walkframes = []
-        self.adjust_images()
-
-    def make_mask(self):
-        mask_surface = pg.Surface(self.rect.size).convert_alpha()
-        mask_surface.fill(TRANSPARENT)
-        mask_surface.fill(pg.Color("white"), (5,5,40,40))
-        mask = pg.mask.from_surface(mask_surface)
-        return mask
-
-    def get_frames(self):
-        indices = [[0,0], [1,0], [2,0], [3,0]]
-        return get_images(self.sprites, indices, self.rect.size)
-
-    def adjust_images(self):
-        if self.direction != self.old_direction:
-            self.walkframes = [self.frames[0], self.frames[1], self.frames[2], self.frames[3]]
-            self.old_direction = self.direction
-            self.redraw = True
-        self.make_image()
-
-    def make_image(self):
-        now = pg.time.get_ticks()
-        if self.redraw or now-self.animate_timer > 1000/self.animate_fps:
-            self.frame = (self.frame+1)%len(self.walkframes)
-            self.image = self.walkframes[self.frame]
-            self.animate_timer = now
-        if not self.image:
-            self.image = self.walkframes[self.frame]
-        self.redraw = False
+        self.clip = None
+        self.set_clip('player', 0)
+
+    def set_clip(self, clip_id, now):
+        self.clip = animation.clip(clip_id)
+        for frame in self.clip.frames:
+            rotations.prepare(frame)
+        self.adjust_images(now)
+
+    def adjust_images(self, now):
+        self.image = self.clip.frame(now)
 
     def add_direction(self, key):
         if key in DIRECT_DICT:
@@ -93,7 +102,7 @@ class Player(pg.sprite.Sprite):
             if self.direction_stack:
                 self.direction = self.direction_stack[-1]
 
-    def update(self, obstacles, dt, camera):
+    def update(self, obstacles, dt, camera, now):
         vector = [0, 0]
         for key in self.direction_stack:
             vector[0] += DIRECT_DICT[key][0]
@@ -105,15 +114,22 @@ class Player(pg.sprite.Sprite):
         vector[0], self.remainder[0] = divfmod(self.remainder[0], 1)
         vector[1], self.remainder[1] = divfmod(self.remainder[1], 1)
         if vector != [0, 0]:
-            self.adjust_images()
+            self.adjust_images(now)
             self.movement(obstacles, vector[0], 0)
             self.movement(obstacles, vector[1], 1)
 
             camera.update(self)
 
     def movement(self, obstacles, offset, i):
+        if obstacles.solid:
+            allowed = obstacles.sweep(self.hitbox.move(self.rect.topleft), offset, i)
+            self.rect[i] += allowed
+            if allowed != offset:
+                self.remainder[i] = 0
+            return
+        # irregular obstacles, back off until the masks stop overlapping
         self.rect[i] += offset
-        collisions = pg.sprite.spritecollide(self, obstacles, False)
+        collisions = obstacles.spritecollide(self)
         callback = pg.sprite.collide_mask
         while pg.sprite.spritecollideany(self, collisions, callback):
             self.rect[i] += (1 if offset<0 else -1)
@@ -126,233 +142,72 @@ class Player(pg.sprite.Sprite):
         rect = camera.apply_rect(self.rect)
         return self.rect.colliderect(enemy)
 
-    def collides_with_improvement(self, improvement, camera):
-        rect = camera.apply_rect(self.rect)
-        return self.rect.colliderect(improvement)
-
-
-class Bullet(pg.sprite.Sprite):
-    def __init__(self, location, angle):
-        pg.sprite.Sprite.__init__(self)
-        bullet_image = pg.image.load(settings.IMG_DIR + "/bullet.png").convert()
-        bullet_image.set_colorkey(COLOR_KEY)
-        self.original_bullet = bullet_image.subsurface((0,0,13,13))
-        self.angle = -math.radians(angle-135)
-        self.image = pg.transform.rotate(self.original_bullet, angle)
-        self.rect = self.image.get_rect(center=location)
-        self.move = [self.rect.x, self.rect.y]
-        self.speed_magnitude = 15
-        self.mask = self.make_mask()
-        self.speed = (self.speed_magnitude*math.cos(self.angle),
-                      self.speed_magnitude*math.sin(self.angle))
-        self.done = False
-
-    def make_mask(self):
-        mask_surface = pg.Surface(self.rect.size).convert_alpha()
-        mask_surface.fill(TRANSPARENT)
-        mask_surface.fill(pg.Color("white"), (0,0,20,20))
-        mask = pg.mask.from_surface(mask_surface)
-        return mask
-
-    def update(self, screen_rect):
-        self.move[0] += self.speed[0]
-        self.move[1] += self.speed[1]
-        self.rect.topleft = self.move
-
-    def check_collision(self, obstacles, camera):
-        rect = camera.apply_rect(self.rect)
-        for obstacle in obstacles:
-            if self.rect.colliderect(obstacle):
-                self.kill()
-
-                if type(obstacle) is Enemy:
-                    obstacle.killed = True
-
-                if type(obstacle) is Player:
-                    obstacle.lifes -= 1
+    def take_weapon(self, now):
+        self.set_clip('player_armed', now)
+        self.weapon = True
+        self.bullets_left = 3
 
 
 class Block(pg.sprite.Sprite):
-    def __init__(self, location):
-        pg.sprite.Sprite.__init__(self)
-        self.image = self.make_image()
-        self.rect = self.image.get_rect(topleft=location)
-        self.mask = pg.mask.from_surface(self.image)
+    border_color = (0, 0, 0)
+    bordered_images = {}  # neighbour mask -> image with borders drawn
 
-    def make_image(self):
-        image = pg.image.load(settings.IMG_DIR + "/block.png").convert_alpha()
-        image.set_colorkey(COLOR_KEY)
-        image.blit(image, (0,0))
-        return image
-
-class Star(pg.sprite.Sprite):
     def __init__(self, location):
         pg.sprite.Sprite.__init__(self)
         self.image = self.make_image()
         self.rect = self.image.get_rect(topleft=location)
-        self.mask = pg.mask.from_surface(self.image)
+        self.mask = masks.from_image(self.image)
 
-    def make_image(self):
-        image = pg.image.load(settings.IMG_DIR + "/star.png").convert_alpha()
-        image.blit(image, (0,0))
-        return image
-
-class Weapon(pg.sprite.Sprite):
-    def __init__(self, location):
-        pg.sprite.Sprite.__init__(self)
-        self.image = self.make_image()
-        self.rect = self.image.get_rect(topleft=location)
-        self.mask = pg.mask.from_surface(self.image)
+    @classmethod
+    def is_solid(cls):
+        """True if blocks fill their whole tile, so TileGrid.sweep() is exact."""
+        image = cls.make_image()
+        return masks.from_image(image).count() == image.get_width() * image.get_height()
 
-    def make_image(self):
-        image = pg.image.load(settings.IMG_DIR + "/weapon.png").convert_alpha()
-        image.blit(image, (0,0))
+    @staticmethod
+    def make_image():
+        image = assets.image("block.png")
+        image.set_colorkey(COLOR_KEY)
         return image
 
-class Notification(pg.sprite.Sprite):
-    def __init__(self, location, number):
-        pg.sprite.Sprite.__init__(self)
-        self.image = self.make_image(number)
-        self.rect = self.image.get_rect(topleft=location)
-        self.mask = pg.mask.from_surface(self.image)
-        self.number = int(number)
+    def set_neighbours(self, neighbours):
+        self.image = Block.bordered_image(neighbours)
 
-    def make_image(self, number):
-        image = pg.image.load(settings.IMG_DIR + "/notification" + number + ".png").convert_alpha()
-        image.blit(image, (0,0))
+    @classmethod
+    def bordered_image(cls, neighbours):
+        image = cls.bordered_images.get(neighbours)
+        if image is None:
+            image = cls.bordered_images[neighbours] = cls.make_bordered_image(neighbours)
         return image
 
-class Ground(pg.sprite.Sprite):
-    def __init__(self, location):
-        pg.sprite.Sprite.__init__(self)
-        self.image = self.make_image()
-        self.rect = self.image.get_rect(topleft=location)
-        self.mask = pg.mask.from_surface(self.image)
-
-    def make_image(self):
-        image = pg.image.load(settings.IMG_DIR + "/ground" + str(random.randint(1, 6)) + ".png").convert_alpha()
-        image.blit(image, (0,0))
+    @classmethod
+    def make_bordered_image(cls, neighbours):
+        # borders are drawn on the sides without a neighbouring block
+        image = cls.make_image().copy()
+        if not neighbours & grid.LEFT:
+            pg.draw.line(image, cls.border_color, (0, 0), (0, 50))
+        if not neighbours & grid.TOP:
+            pg.draw.line(image, cls.border_color, (0, 0), (50, 0))
+        if not neighbours & grid.BOTTOM:
+            pg.draw.line(image, cls.border_color, (0, 49), (50, 49))
+        if not neighbours & grid.RIGHT:
+            pg.draw.line(image, cls.border_color, (49, 0), (49, 50))
         return image
 
-class Enemy(pg.sprite.Sprite):
-    def __init__(self, rect, speed, direction=pg.K_s):
-        self.rect = pg.Rect(rect)
-        self.vector = [0, 1]
-        self.remainder = [0, 0]
-        self.mask = self.make_mask()
-        self.speed = speed
-        self.direction = direction
-        self.old_direction = None
-        self.direction_stack = []
-        self.redraw = False
-        self.image = None
-
-        self.sprites = pg.image.load(settings.IMG_DIR + "/enemy" + str(random.randint(1, 3)) + ".png").convert_alpha()
-
-        self.shooting_time = pg.time.get_ticks()
-
-        self.frame  = 0
-        self.frames = self.get_frames()
-        self.animate_timer = 0.0
-        self.animate_fps = 7.0
-        self.walkframes = []
-        self.walkframe_dict = self.make_frame_dict()
-        self.adjust_images()
-        self.visible = True
-
-        self.killed = False
-
-
-    def make_mask(self):
-        mask_surface = pg.Surface(self.rect.size).convert_alpha()
-        mask_surface.fill(TRANSPARENT)
-        mask_surface.fill(pg.Color("white"), (0,0,50,50))
-        mask = pg.mask.from_surface(mask_surface)
-        return mask
-
-    def make_mask_player(self):
-        mask_surface = pg.Surface(self.rect.size).convert_alpha()
-        mask_surface.fill(TRANSPARENT)
-        mask_surface.fill(pg.Color("white"), (5,5,40,40))
-        mask = pg.mask.from_surface(mask_surface)
-        return mask
-
-    def get_frames(self):
-        indices = [[0,0], [1,0], [2,0], [3,0]]
-        return get_images(self.sprites, indices, self.rect.size)
-
-    def make_frame_dict(self):
-        frames = {pg.K_a: [self.frames[0], self.frames[1], self.frames[2], self.frames[3]],
-                  pg.K_d: [self.frames[0], self.frames[1], self.frames[2], self.frames[3]],
-                  pg.K_s: [self.frames[0], self.frames[1], self.frames[2], self.frames[3]],
-                  pg.K_w: [self.frames[0], self.frames[1], self.frames[2], self.frames[3]]}
-        return frames
-
-    def adjust_images(self):
-        if self.direction != self.old_direction:
-            self.walkframes = self.walkframe_dict[self.direction]
-            self.old_direction = self.direction
-            self.redraw = True
-        self.make_image()
-
-    def make_image(self):
-        now = pg.time.get_ticks()
-        if self.redraw or now-self.animate_timer > 1000/self.animate_fps:
-            self.frame = (self.frame+1)%len(self.walkframes)
-            self.image = self.walkframes[self.frame]
-            self.animate_timer = now
-        if not self.image:
-            self.image = self.walkframes[self.frame]
-        self.redraw = False
-
-    def update(self, obstacles, dt, camera):
-        vector = self.vector[:] # copy list to prevent modification for global val
-        factor = (math.sqrt(2)/2 if all(vector) else 1)
-        frame_speed = self.speed*factor*dt
-        self.remainder[0] += vector[0]*frame_speed
-        self.remainder[1] += vector[1]*frame_speed
-        vector[0], self.remainder[0] = divfmod(self.remainder[0], 1)
-        vector[1], self.remainder[1] = divfmod(self.remainder[1], 1)
-        if vector != [0, 0]:
-            self.adjust_images()
-            self.movement(obstacles, vector[0], 0)
-            self.movement(obstacles, vector[1], 1)
-
-    def movement(self, obstacles, offset, i):
-        self.rect[i] += offset
-        collisions = pg.sprite.spritecollide(self, obstacles, False)
-        callback = pg.sprite.collide_mask
-        while pg.sprite.spritecollideany(self, collisions, callback):
-            self.rect[i] += (1 if offset<0 else -1)
-            self.remainder[i] = 0
-            rand_move = random.choice([pg.K_s, pg.K_a, pg.K_w, pg.K_d])
-            while rand_move == self.direction:
-                rand_move = random.choice([pg.K_s, pg.K_a, pg.K_w, pg.K_d])
-                pass
-            self.direction = rand_move
-            if self.direction == pg.K_a:
-                self.direction = pg.K_a
-                self.vector = [-1, 0]
-            elif self.direction == pg.K_w:
-                self.direction = pg.K_w
-                self.vector = [0, -1]
-            elif self.direction == pg.K_s:
-                self.direction = pg.K_s
-                self.vector = [0, 1]
-            elif self.direction == pg.K_d:
-                self.direction = pg.K_d
-                self.vector = [1, 0]
-
-    def draw(self, surface):
-        surface.blit(self.image, self.rect)
-
 
 class Game(object):
-    def __init__(self):
+    def __init__(self, seed=settings.SEED, recorder=None):
+        self.seed = seed
+        self.rng = rng_streams(seed)
+        self.recorder = recorder  # recording.Recorder fed the inputs of every step
         self.screen = pg.display.get_surface()
         self.screen_rect = self.screen.get_rect()
         self.clock = pg.time.Clock()
-        self.fps = 60.0
+        self.fps = settings.MAX_FPS
+        self.step_time = 1.0 / settings.TICK_RATE
+        self.ticks = 0.0  # simulated milliseconds, advanced by step()
+        self.previous = None  # player and camera topleft before the last step
+        self.profiler = FrameProfiler(settings.PROFILE_WINDOW)
         self.done = False
         self.closed = False
         self.keys = pg.key.get_pressed()
@@ -361,19 +216,25 @@ class Game(object):
         self.angle = -math.radians(10-135)
         self.mouse = None
 
-        self.player_bullets = pg.sprite.Group()
-        self.enemy_bullets = pg.sprite.Group()
         self.weapon = []
-        self.elements = []
-        self.obstacles = []
+        self.level = None
         self.enemies = []
-        self.improvements = []
-        self.notifications = []
+        self.entities = None  # ecs.World of the pickups
+        self.triggers = None  # pickups.TriggerIndex of the same
         self.show_notification = 0
-
+        self.static_layer = None
+        self.world = None
+        self.enemy_store = None
+        self.enemy_pool = None  # parallel.EnemyPool when ENEMY_WORKERS is set
+        self.ai = None
+        self.navigation = None
+        self.grid = None
+        self.map_rect = None
+
+        bullet_image = assets.image("bullet.png", assets.COLORKEY).subsurface((0,0,13,13))
+        self.bullets = bullets.BulletPool(bullet_image, rotations)
         self.font = pg.font.Font(settings.FONTS_DIR + '/Flames.ttf', 14)
-        self.life_bar = pg.image.load(settings.IMG_DIR + "/life_bar.png").convert_alpha()
-        self.life = pg.image.load(settings.IMG_DIR + "/life.png").convert_alpha()
+        self.hud = Hud(self.font)
 
 
     def get_angle(self, mouse):
@@ -381,67 +242,60 @@ class Game(object):
         offset = (mouse[1]-(self.player.rect.centery + self.camera.state.y), mouse[0]-(self.player.rect.centerx + self.camera.state.x))
         self.angle = 135-math.degrees(math.atan2(*offset))
 
-    def load_map(self):
-        blocks = []
-        elements = []
+    def load_map(self, path=None, level_data=None):
+        if level_data is None:
+            level_data = level.load(path or settings.MAP_PATH)
+        self.level = level_data
         self.enemies = []
-        f = open(settings.DATA_DIR + '/map.txt', 'r')
-        row = 0
-        random.seed(3) # to make ground load the same, but "random"
-        for line in f.readlines():
-            column = 0
-            for char in line:
-                if char == '#':
-                    blocks.append(Block((column*50, row*50)))
-                    column += 1
-                    continue
-                elif char == 'E':
-                    enemy = Enemy((0, 0, 50, 50), 100)
-                    enemy.rect.center = (column*50, row*50)
-                    self.enemies.append(enemy)
-                elif char == 'B':
-                    self.improvements.append(Star((column*50+20, row*50+20)))
-                elif char == 'W':
-                    self.improvements.append(Weapon((column*50 + 15, row*50 + 15)))
-                elif char == '1':
-                    self.notifications.append(Notification((column*50 + 15, row*50 + 15), char))
-                elif char == '2':
-                    self.notifications.append(Notification((column*50 + 15, row*50 + 15), char))
-                elements.append(Ground((column*50, row*50)))
-                column += 1
-            self.camera_width = column * 50
-            row += 1
-        self.camera_height = row * 50
-        self.obstacles = pg.sprite.Group(blocks)
-        self.elements = pg.sprite.Group(elements)
-
-
-        border_color = (0, 0, 0)
-        for obj in self.obstacles:
-            draw_top = True
-            draw_right = True
-            draw_left = True
-            draw_bottom = True
-            for obj2 in self.obstacles:
-                if obj2.rect.left - 50 == obj.rect.left and obj2.rect.top == obj.rect.top:
-                    draw_left = False
-                if obj2.rect.right + 50 == obj.rect.right and obj2.rect.top == obj.rect.top:
-                    draw_right = False
-                if obj2.rect.top - 50 == obj.rect.top and obj2.rect.left == obj.rect.left:
-                    draw_bottom = False
-                if obj2.rect.bottom + 50 == obj.rect.bottom and obj2.rect.left == obj.rect.left:
-                    draw_top = False
-            if draw_right:
-                pg.draw.line(obj.image, border_color, (0, 0), (0, 50))
-            if draw_top:
-                pg.draw.line(obj.image, border_color, (0, 0), (50, 0))
-            if draw_bottom:
-                pg.draw.line(obj.image, border_color, (0, 49), (50, 49))
-            if draw_left:
-                pg.draw.line(obj.image, border_color, (49, 0), (49, 50))
+        self.rng = rng_streams(self.seed)  # to make enemies load the same, but "random"
+        self.entities = ecs.World()
+        self.triggers = pickups.TriggerIndex()
+        pickups.register(self.entities)
+        for char, column, row in self.level.spawns:
+            pickups.spawn(self.entities, self.triggers, char, column, row)
+        self.entities.flush()
+
+        self.camera_width = self.level.columns * 50
+        self.camera_height = self.level.rows * 50
+        self.map_rect = pg.Rect(0, 0, self.camera_width, self.camera_height)
+        self.close()
+        self.enemy_pool = None
+        if settings.ENEMY_WORKERS:
+            self.enemy_store = parallel.SharedEnemyStore()
+        else:
+            self.enemy_store = EnemyStore()
+        # blocks and enemies are created chunk by chunk as the camera gets near
+        self.world = ChunkedWorld(self.level, self.make_block, self.make_enemy)
+        self.grid = self.world.grid
+        self.grid.solid = Block.is_solid()
+        self.ai = ai.EnemyAI(self.enemy_store, self.grid)
+        self.navigation = Navigation(self.level, rng=self.rng['patrol'])
+        if settings.ENEMY_WORKERS:
+            self.enemy_pool = parallel.EnemyPool(self.enemy_store, self.navigation,
+                                                 self.camera_width, seed=self.seed)
+
+        self.static_layer = None
+        if settings.STATIC_LAYER:
+            self.static_layer = StaticLayer(self.level, Block.bordered_image)
+
+    def make_block(self, column, row):
+        block = Block((column*50, row*50))
+        block.set_neighbours(int(self.level.borders[row, column]))
+        return block
+
+    def make_enemy(self, column, row):
+        return self.enemy_store.spawn((column*50 + 25, row*50 + 25), self.rng['spawns'].randint(0, enemies.KINDS - 1))
+
+    def view_rect(self):
+        return self.screen_rect.move(-self.camera.state.x, -self.camera.state.y)
+
+    def update_world(self):
+        self.world.update(self.view_rect())
+        self.enemies = self.world.active_enemies()
 
 
     def event_loop(self):
+        inputs = Inputs()
         for event in pg.event.get():
             self.keys = pg.key.get_pressed()
             if event.type == pg.QUIT or self.keys[pg.K_ESCAPE]:
@@ -460,125 +314,140 @@ class Game(object):
                 print  [(self.mouse[0], self.mouse[1]), (self.player.rect.centerx + abs(self.camera.state.x), self.player.rect.centery + abs(self.camera.state.y))]
                 print 'Angle:'
                 print self.angle
+            elif event.type == pg.KEYDOWN and event.key == pg.K_F3:
+                self.profiler.visible = not self.profiler.visible
+            elif event.type == pg.KEYDOWN and event.key == pg.K_F4:
+                self.profiler.dump(settings.PROFILE_DUMP)
             elif event.type == pg.KEYDOWN:
                 self.player.add_direction(event.key)
             elif event.type == pg.KEYUP:
                 self.player.pop_direction(event.key)
 
             if event.type == pg.MOUSEBUTTONDOWN and event.button == 1:
-                if self.player.bullets_left > 0 and self.player.weapon:
-                    self.player_bullets.add(Bullet(self.player.rect.center, self.angle))
-                    self.player.bullets_left -= 1
+                inputs.fire = True
             elif event.type == pg.MOUSEMOTION:
-                self.get_angle(event.pos)
-
+                inputs.mouse = event.pos
+        inputs.directions = list(self.player.direction_stack)
+        return inputs
 
-    def draw(self):
-        # draw ground
-        i = 0
-        for obj in self.elements:
-            rect = self.camera.apply(obj)
-            if rect.colliderect(self.screen_rect):
-                self.screen.blit(obj.image, rect)
-
-        # draw blocks
-        for obj in self.obstacles:
-            rect = self.camera.apply(obj)
-            if rect.colliderect(self.screen_rect):
-                self.screen.blit(obj.image, rect)
-
-        # draw stars
-        for obj in self.improvements:
-            rect = self.camera.apply(obj)
-            if rect.colliderect(self.screen_rect):
-                self.screen.blit(obj.image, rect)
+    def start(self, map_path=None, level_data=None):
+        self.load_map(map_path, level_data)
+        self.camera = Camera(complex_camera, self.camera_width, self.camera_height)
+        self.update_world()
+
+    def close(self):
+        """Stop the enemy worker processes, if any.
+
+        A game stepped again afterwards starts new ones when it needs them.
+        """
+        if self.enemy_pool:
+            self.enemy_pool.close()
+
+    def step(self, inputs, dt):
+        """Advance the simulation by dt seconds with the given inputs.
+
+        Nothing here touches the display or the event queue timing, so the
+        same inputs and dt always give the same result.
+        """
+        if self.recorder:
+            self.recorder.record(inputs)
+        if self.show_notification != 0:
+            if inputs.confirm:
+                self.show_notification = 0
+                self.player.direction_stack = []
+            return
+
+        self.snapshot()
+        self.ticks += dt*1000
+        self.player.direction_stack = list(inputs.directions)
+        if self.player.direction_stack:
+            self.player.direction = self.player.direction_stack[-1]
+        if inputs.mouse:
+            self.get_angle(inputs.mouse)
+        if inputs.fire and self.player.bullets_left > 0 and self.player.weapon:
+            self.bullets.fire(self.player.rect.center, self.angle, bullets.PLAYER)
+            self.player.bullets_left -= 1
+
+        self.update_world()
+        with self.profiler.phase('enemies'):
+            # every enemy near the camera keeps moving, on screen or not
+            self.navigation.update(self.player.rect.center)
+            if self.enemy_pool:
+                self.enemy_pool.update(self.enemies, dt, self.ticks)
+            else:
+                self.enemy_store.update(self.enemies, self.navigation, dt, self.ticks)
+            survivors = []
+            for enemy in self.enemies:
+                if enemy.killed:
+                    self.world.remove_enemy(enemy)
+                    self.enemy_store.remove(enemy)
+                else:
+                    self.world.moved(enemy)
+                    survivors.append(enemy)
+            self.enemies = survivors
+        with self.profiler.phase('player'):
+            self.player.update(self.grid, dt, self.camera, self.ticks)
+        with self.profiler.phase('update'):
+            self.update(self.grid, dt)
+        with self.profiler.phase('ai'):
+            for location, angle in self.ai.update(self.enemies, self.player.rect, self.ticks):
+                self.bullets.fire(location, angle, bullets.ENEMY)
+
+    def snapshot(self):
+        """Remember where everything was before a step, for interpolated drawing."""
+        self.previous = (self.player.rect.topleft, self.camera.state.topleft)
+        self.enemy_store.snapshot()
+        self.bullets.snapshot()
+
+    def interpolate(self, alpha):
+        """Player rect and camera alpha of the way from the previous step."""
+        camera = Camera(self.camera.camera_func, self.camera.state.width, self.camera.state.height)
+        camera.state = self.camera.state.copy()
+        player_rect = self.player.rect.copy()
+        if self.previous is not None:
+            (px, py), (cx, cy) = self.previous
+            player_rect.topleft = (lerp(px, player_rect.x, alpha), lerp(py, player_rect.y, alpha))
+            camera.state.topleft = (lerp(cx, camera.state.x, alpha), lerp(cy, camera.state.y, alpha))
+        return player_rect, camera
+
+    def draw(self, alpha=1.0):
+        """Draw the game alpha of the way from the previous step to the last one."""
+        player_rect, camera = self.interpolate(alpha)
+        view = Viewport(camera, self.screen_rect.size, self.level.columns, self.level.rows)
+        if self.static_layer:
+            # draw ground and blocks
+            try:
+                self.static_layer.draw(self.screen, camera)
+            except (pg.error, MemoryError):
+                self.static_layer = None  # fall back to drawing every tile
+        if not self.static_layer:
+            # draw ground
+            draw_ground(self.screen, view, self.level)
+
+            # draw blocks
+            for row in view.rows:
+                for column in view.columns:
+                    block = self.grid.get(column, row)
+                    if block is not None:
+                        self.screen.blit(block.image, block.rect.move(view.x, view.y))
+
+        # draw stars and the weapon
+        pickups.draw(self.entities, self.triggers, self.screen, view)
 
         # draw player
-        self.screen.blit(pg.transform.rotate(self.player.image, self.angle +135), self.camera.apply(self.player))
+        self.screen.blit(rotations.rotate(self.player.image, self.angle +135), camera.apply_rect(player_rect))
 
         # draw enemies
-        distance = 300
-        margin = 100
-        for enemy in self.enemies:
-            rect = self.camera.apply(enemy)
-            enemy.visible = rect.colliderect(self.screen_rect)
-            if enemy.visible:
-                if enemy.direction == pg.K_w:
-                    self.screen.blit(pg.transform.rotate(enemy.image, 0), rect)
-                elif enemy.direction == pg.K_d:
-                    self.screen.blit(pg.transform.rotate(enemy.image, 270), rect)
-                elif enemy.direction == pg.K_s:
-                    self.screen.blit(pg.transform.rotate(enemy.image, 180), rect)
-                else:
-                    self.screen.blit(pg.transform.rotate(enemy.image, 90), rect)
-
-                if math.sqrt((self.player.rect.x - enemy.rect.x)**2 + (self.player.rect.y - enemy.rect.y)**2) < distance:
-                    #  pg.draw.lines(self.screen, (200, 150, 150), 1, [(self.player.rect.x + self.camera.state.x, self.player.rect.y + self.camera.state.y), (enemy.rect.x + self.camera.state.x, enemy.rect.y + self.camera.state.y)])
-                    if enemy.direction == pg.K_w:
-                        rect = pg.Rect(
-                                enemy.rect.x - margin / 2,
-                                enemy.rect.y - distance,
-                                margin * 2,
-                                distance)
-                        #  pg.draw.rect(self.screen, (200, 150, 150), self.camera.apply_rect(rect), 1)
-                    elif enemy.direction == pg.K_s:
-                        rect = pg.Rect(
-                                enemy.rect.x - margin / 2,
-                                enemy.rect.y,
-                                margin * 2,
-                                distance)
-                        #  pg.draw.rect(self.screen, (200, 150, 150), self.camera.apply_rect(rect), 1)
-                    elif enemy.direction == pg.K_d:
-                        rect = pg.Rect(
-                                enemy.rect.x,
-                                enemy.rect.y - margin / 2,
-                                distance,
-                                margin * 2)
-                        #  pg.draw.rect(self.screen, (200, 150, 150), self.camera.apply_rect(rect), 1)
-                    elif enemy.direction == pg.K_a:
-                        rect = pg.Rect(
-                                enemy.rect.x - distance,
-                                enemy.rect.y - margin / 2,
-                                distance,
-                                margin * 2)
-                        #  pg.draw.rect(self.screen, (200, 150, 150), self.camera.apply_rect(rect), 1)
-                    if rect.colliderect(self.player):
-                        #  pg.draw.lines(self.screen, (200, 150, 150), 1, [(enemy.rect.x + self.camera.state.x, enemy.rect.y + self.camera.state.y), (enemy.rect.x + self.camera.state.x, enemy.rect.y + self.camera.state.y - distance)])
-                        now = pg.time.get_ticks()
-                        if now-enemy.shooting_time > 200:
-                            enemy.shooting_time = now
-                            dx = enemy.rect.x - self.player.rect.x
-                            dy = enemy.rect.y - self.player.rect.y
-                            rads = math.atan2(-dy,dx)
-                            rads %= 2*math.pi
-                            angle = math.degrees(rads) - 40
-                            self.enemy_bullets.add(Bullet(enemy.rect.center, angle))
-                    #  if enemy.direction == pg.K_s:
-                        #  pg.draw.lines(self.screen, (200, 150, 150), 1, [(enemy.rect.x + self.camera.state.x, enemy.rect.y + self.camera.state.y), (enemy.rect.x + self.camera.state.x, enemy.rect.y + self.camera.state.y + distance)])
-                    #  if enemy.direction == pg.K_d:
-                        #  pg.draw.lines(self.screen, (200, 150, 150), 1, [(enemy.rect.x + self.camera.state.x, enemy.rect.y + self.camera.state.y), (enemy.rect.x + self.camera.state.x + distance, enemy.rect.y + self.camera.state.y)])
-                    #  if enemy.direction == pg.K_a:
-                        #  pg.draw.lines(self.screen, (200, 150, 150), 1, [(enemy.rect.x + self.camera.state.x, enemy.rect.y + self.camera.state.y), (enemy.rect.x + self.camera.state.x - distance, enemy.rect.y + self.camera.state.y)])
+        for enemy in self.world.enemies_in(view.rect):
+            rect = enemy.rect_at(alpha)
+            if rect.colliderect(view.rect):
+                self.screen.blit(enemy_rotations.rotate(enemy.image, ENEMY_ANGLES[enemy.direction]),
+                                 rect.move(view.x, view.y))
 
         # draw shootings
-        for obj in self.player_bullets:
-            rect = self.camera.apply(obj)
-            if rect.colliderect(self.screen_rect):
-                self.screen.blit(obj.image, rect)
-
-        for obj in self.enemy_bullets:
-            rect = self.camera.apply(obj)
-            if rect.colliderect(self.screen_rect):
-                self.screen.blit(obj.image, rect)
-
-        self.screen.blit(self.font.render('Solder: John Doe', 1, (250, 250, 250)), (10, 10, 200, 50))
-        self.screen.blit(self.life_bar, (settings.SCREEN_SIZE[0] - 125 - 20, settings.SCREEN_SIZE[1] - 18 - 20, 125, 18))
-        for i in range(0, self.player.lifes):
-            self.screen.blit(self.life, (settings.SCREEN_SIZE[0] - 140 + i * 16 + i * 3, settings.SCREEN_SIZE[1] - 18 - 16, 125, 18))
-        if self.player.weapon:
-            self.screen.blit(self.font.render('Bullets: %d' % self.player.bullets_left, 1, (250, 250, 250)), (10, settings.SCREEN_SIZE[1]-30, 500, 500))
-        else:
-            self.screen.blit(self.font.render('No weapon yet', 1, (250, 250, 250)), (10, settings.SCREEN_SIZE[1]-30, 500, 500))
+        self.bullets.draw(self.screen, camera, alpha)
+
+        self.hud.draw(self.screen, self.player)
 
         #  for obj in self.player_bullets:
             #  olist = obj.make_mask().outline()
@@ -597,61 +466,45 @@ class Game(object):
         caption = "{} - FPS: {:.2f}".format(settings.SCREEN_TITLE, self.clock.get_fps())
         pg.display.set_caption(caption)
 
-    def update(self, obstacles):
-        for notification in self.notifications:
-            if self.player.collides_with_improvement(notification, self.camera) and not self.player.weapon:
-                for notification in self.notifications:
-                    if notification.number == notification.number:
-                        self.notifications.remove(notification)
-                self.notifications = []
-                self.show_notification = notification.number
-                pg.event.clear()
-                return
-
-        for obj in self.player_bullets:
-            obj.check_collision(obstacles, self.camera)
-            obj.check_collision(self.enemies, self.camera)
-        for obj in self.enemy_bullets:
-            obj.check_collision(obstacles, self.camera)
-            obj.check_collision([self.player], self.camera)
+    def update(self, obstacles, dt):
+        if self.bullets:
+            self.bullets.collide_grid(obstacles)
+            hits = self.bullets.collide_rects([enemy.rect for enemy in self.enemies], bullets.PLAYER)
+            for enemy, hit in zip(self.enemies, hits):
+                if hit:
+                    enemy.killed = True
+            self.player.lifes -= int(self.bullets.collide_rects([self.player.rect], bullets.ENEMY)[0])
             if self.player.lifes < 1:
                 self.done = True
         for enemy in self.enemies:
-            if enemy.visible:
-                if self.player.collides_with_enemy(enemy, self.camera):
-                    self.player.kill()
-                    self.done = True
-        for improvement in self.improvements:
-            if type(improvement) is Star:
-                if self.player.collides_with_improvement(improvement, self.camera) and self.player.weapon and self.player.bullets_left < self.player.max_bullets:
-                    self.player.bullets_left = self.player.max_bullets
-                    self.improvements.remove(improvement)
-            elif type(improvement) is Weapon:
-                if self.player.collides_with_improvement(improvement, self.camera) and not self.player.weapon:
-                    self.player.sprites = pg.image.load(settings.IMG_DIR + "/player_with_weapon.png").convert_alpha()
-                    self.player.frames = self.player.get_frames()
-                    self.player.adjust_images()
-                    self.player.weapon = True
-                    self.player.bullets_left = 3
-                    self.improvements.remove(improvement)
-                    self.show_notification = 2
-                    pg.event.clear()
-        self.player_bullets.update(self.screen_rect)
-        self.enemy_bullets.update(self.screen_rect)
+            if self.player.collides_with_enemy(enemy, self.camera):
+                self.player.kill()
+                self.done = True
+        self.entities.run(self)
+        self.bullets.update(self.map_rect, dt)
 
     def main_loop(self):
         delta = self.clock.tick(self.fps)/1000.0
 
+        block_img = assets.image("ground1.png")
+        for i in range(0, settings.SCREEN_SIZE[0] / 50 + 1):
+            for n in range(0, settings.SCREEN_SIZE[1] / 50 + 1):
+                self.screen.blit(block_img, (i * 50, n * 50, 50, 50))
+        game_over_img = assets.image("game_opening.png")
+        opening_rect = draw_centered(self.screen, game_over_img)
+        pg.display.update()
+
+        # images and the level load in the background while the title is shown
+        preloader = assets.Preloader(assets.cache, jobs=[('level', lambda: level.load(settings.MAP_PATH))])
+        preloader.start()
+        progress_rect = pg.Rect(opening_rect.left, opening_rect.bottom + 10, opening_rect.width, 12)
+
         loading_screen = True
         while loading_screen:
-            block_img = pg.image.load(settings.IMG_DIR + "/ground1.png").convert_alpha()
-            for i in range(0, settings.SCREEN_SIZE[0] / 50 + 1):
-                for n in range(0, settings.SCREEN_SIZE[1] / 50 + 1):
-                    self.screen.blit(block_img, (i * 50, n * 50, 50, 50))
-
-            game_over_img = pg.image.load(settings.IMG_DIR + "/game_opening.png").convert_alpha()
-            self.screen.blit(game_over_img, (settings.SCREEN_SIZE[0] / 2 - 528 / 2, settings.SCREEN_SIZE[1] / 2 - 294 / 2, 528, 294))
-            pg.display.update()
+            if preloader.total and preloader.done < preloader.total:
+                preloader.poll()
+                pg.display.update(draw_progress(self.screen, progress_rect, preloader.progress()))
+            self.clock.tick(self.fps)
             self.display_fps()
 
             for event in pg.event.get():
@@ -663,45 +516,65 @@ class Game(object):
                 elif event.type == pg.MOUSEBUTTONDOWN:
                     loading_screen = False
 
-        self.load_map()
-        self.camera = Camera(complex_camera, self.camera_width, self.camera_height)
+        self.start(level_data=preloader.finish()['level'])
 
+        # The simulation advances in fixed steps of step_time, as many as the
+        # elapsed time allows; drawing interpolates between the last two.
+        notification_shown = 0
+        lag = 0.0
+        pending = None  # input of frames in which no step ran
         while not self.done:
             if self.show_notification != 0:
-                notification_img = pg.image.load(settings.IMG_DIR + "/notification" + str(self.show_notification) + ".png").convert_alpha()
-                self.screen.blit(notification_img, (settings.SCREEN_SIZE[0] / 2 - 528 / 2, settings.SCREEN_SIZE[1] / 2 - 294 / 2, 528, 294))
+                if notification_shown != self.show_notification:
+                    # keys pressed before the notice came up do not dismiss it
+                    pg.event.clear()
+                    # the game view is frozen, so only the notice needs updating
+                    notification_img = assets.image("notification" + str(self.show_notification) + ".png")
+                    pg.display.update(draw_centered(self.screen, notification_img))
+                    notification_shown = self.show_notification
 
+                inputs = Inputs()
                 for event in pg.event.get():
                     self.keys = pg.key.get_pressed()
                     if event.type == pg.QUIT or self.keys[pg.K_ESCAPE]:
                         sys.exit(0)
                     elif event.type == pg.KEYDOWN:
-                        self.show_notification = 0
-                        pg.event.clear()
-                        self.player.direction_stack = []
+                        inputs.confirm = True
+                self.step(inputs, self.step_time)
+                if inputs.confirm:
+                    pg.event.clear()
+                    notification_shown = 0
+                lag = 0.0
+                pending = None
                 delta = self.clock.tick(self.fps)/1000.0
-                pg.display.update()
                 self.display_fps()
             else:
-                self.event_loop()
-                for enemy in self.enemies:
-                    if enemy.visible:
-                        enemy.update(self.obstacles, delta, self.camera)
-                        if enemy.killed:
-                            self.enemies.remove(enemy)
-                self.player.update(self.obstacles, delta, self.camera)
-                self.update(self.obstacles)
-                self.draw()
-                pg.display.update()
+                self.profiler.begin_frame()
+                with self.profiler.phase('event_loop'):
+                    inputs = self.event_loop()
+                pending = pending.merge(inputs) if pending else inputs
+                lag += min(delta, settings.MAX_FRAME_STEPS * self.step_time)
+                while lag >= self.step_time and not self.done:
+                    self.step(pending, self.step_time)
+                    pending = Inputs(pending.directions)  # clicks count once
+                    lag -= self.step_time
+                    if self.show_notification != 0:
+                        lag = 0.0
+                        break
+                with self.profiler.phase('draw'):
+                    self.draw(lag / self.step_time)
+                    if self.profiler.visible:
+                        self.profiler.draw(self.screen, self.font)
+                with self.profiler.phase('flip'):
+                    pg.display.update()
                 delta = self.clock.tick(self.fps)/1000.0
                 self.display_fps()
-
+        self.close()
 
         if not self.closed:
+            pg.display.update(draw_centered(self.screen, assets.image("game_over.png")))
             while True:
-                game_over_img = pg.image.load(settings.IMG_DIR + "/game_over.png").convert_alpha()
-                self.screen.blit(game_over_img, (settings.SCREEN_SIZE[0] / 2 - 528 / 2, settings.SCREEN_SIZE[1] / 2 - 294 / 2, 528, 294))
-                pg.display.update()
+                self.clock.tick(self.fps)
                 self.display_fps()
 
                 for event in pg.event.get():
@@ -744,12 +617,13 @@ def complex_camera(camera, target_rect):
     return pg.Rect(l, t, w, h)
 
 
-def get_images(sheet, frame_indices, size):
-    frames = []
-    for cell in frame_indices:
-        frame_rect = ((size[0]*cell[0],size[1]*cell[1]), size)
-        frames.append(sheet.subsurface(frame_rect))
-    return frames
+def rng_streams(seed):
+    """One random generator per subsystem, so they do not disturb each other."""
+    return dict((name, random.Random('%s/%s' % (seed, name))) for name in RNG_STREAMS)
+
+
+def lerp(start, end, alpha):
+    return int(round(start + (end - start) * alpha))
 
 
 def divfmod(x, y):
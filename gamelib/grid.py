@@ -0,0 +1,95 @@
+# 3rd party
+import numpy as np
+
+# local
+import settings
+
+
+# Neighbour mask bits of the block borders, see level.borders().
+LEFT = 1
+RIGHT = 2
+TOP = 4
+BOTTOM = 8
+
+
+class TileGrid(object):
+    """Tile occupancy index of the map obstacles.
+
+    Every obstacle sits in exactly one map cell, so the obstacles touching
+    a rect are found by looking at the handful of cells the rect covers
+    instead of testing every obstacle.
+
+    `occupied` covers the whole map, while obstacle sprites are only kept
+    for the cells that are currently loaded.
+    """
+
+    def __init__(self, columns, rows, tile_size=settings.TILE_SIZE, occupied=None):
+        self.columns = columns
+        self.rows = rows
+        self.tile_size = tile_size
+        self.tiles = {}  # (column, row) -> obstacle sprite
+        self.solid = True  # obstacles fill their whole tile, see sweep()
+        if occupied is None:
+            occupied = np.zeros((rows, columns), dtype=bool)
+        self.occupied = occupied
+
+    def add(self, sprite):
+        column = sprite.rect.x // self.tile_size
+        row = sprite.rect.y // self.tile_size
+        self.tiles[(column, row)] = sprite
+        self.occupied[row, column] = True
+
+    def discard(self, sprite):
+        # the cell stays occupied, only the sprite is unloaded
+        self.tiles.pop((sprite.rect.x // self.tile_size, sprite.rect.y // self.tile_size), None)
+
+    def get(self, column, row):
+        return self.tiles.get((column, row))
+
+    def cell_range(self, rect):
+        size = self.tile_size
+        columns = range(max(0, rect.left // size), min(self.columns, (rect.right - 1) // size + 1))
+        rows = range(max(0, rect.top // size), min(self.rows, (rect.bottom - 1) // size + 1))
+        return columns, rows
+
+    def collide(self, rect):
+        columns, rows = self.cell_range(rect)
+        found = []
+        tiles = self.tiles
+        for row in rows:
+            for column in columns:
+                tile = tiles.get((column, row))
+                if tile is not None and tile.rect.colliderect(rect):
+                    found.append(tile)
+        return found
+
+    def spritecollide(self, sprite):
+        return self.collide(sprite.rect)
+
+    def sweep(self, rect, offset, axis):
+        """How much of offset rect can move along axis (0 for x, 1 for y).
+
+        Occupied tiles are treated as solid squares, so the exact distance
+        to the nearest one in the way is found without stepping pixel by
+        pixel. rect must not overlap an occupied tile already.
+        """
+        if not offset:
+            return 0
+        target = rect.move((offset, 0) if axis == 0 else (0, offset))
+        columns, rows = self.cell_range(rect.union(target))
+        if not len(columns) or not len(rows):
+            return offset
+        cells = self.occupied[rows[0]:rows[-1] + 1, columns[0]:columns[-1] + 1]
+        if axis == 0:
+            lines = np.flatnonzero(cells.any(axis=0)) + columns[0]
+            start, end = rect.left, rect.right
+        else:
+            lines = np.flatnonzero(cells.any(axis=1)) + rows[0]
+            start, end = rect.top, rect.bottom
+        if offset > 0:
+            gaps = lines * self.tile_size - end
+            gaps = gaps[gaps >= 0]
+            return int(min(offset, gaps.min())) if len(gaps) else offset
+        gaps = (lines + 1) * self.tile_size - start
+        gaps = gaps[gaps <= 0]
+        return int(max(offset, gaps.max())) if len(gaps) else offset
@@ -0,0 +1,59 @@
+# 3rd party
+import pygame as pg
+
+# local
+import assets
+import settings
+
+
+TEXT_COLOR = (250, 250, 250)
+
+
+class Hud(object):
+    """Soldier name, bullet count and lifes drawn over the game view.
+
+    Text is only re-rendered when its value changes.
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self.life_bar = assets.image("life_bar.png")
+        self.life = assets.image("life.png")
+        self.texts = {}  # slot -> (text, rendered surface)
+
+    def text(self, slot, text):
+        cached = self.texts.get(slot)
+        if cached is None or cached[0] != text:
+            cached = self.texts[slot] = (text, self.font.render(text, 1, TEXT_COLOR))
+        return cached[1]
+
+    def draw(self, surface, player):
+        """Draw the HUD over the game view.
+
+        Gameplay frames scroll, so they update the whole display and the
+        HUD keeps no dirty rects of its own.
+        """
+        width, height = settings.SCREEN_SIZE
+        surface.blit(self.text('name', 'Solder: John Doe'), (10, 10))
+        surface.blit(self.life_bar, (width - 125 - 20, height - 18 - 20))
+        for i in range(0, player.lifes):
+            surface.blit(self.life, (width - 140 + i * 16 + i * 3, height - 18 - 16))
+        if player.weapon:
+            text = 'Bullets: %d' % player.bullets_left
+        else:
+            text = 'No weapon yet'
+        surface.blit(self.text('bullets', text), (10, height - 30))
+
+
+def draw_progress(surface, rect, fraction):
+    """Draw a progress bar filled to fraction and return its rect."""
+    pg.draw.rect(surface, (20, 20, 20), rect)
+    bar = pg.Rect(rect).inflate(-4, -4)
+    bar.width = int(bar.width * fraction)
+    pg.draw.rect(surface, TEXT_COLOR, bar)
+    return pg.Rect(rect)
+
+
+def draw_centered(surface, image):
+    """Blit a 528x294 notice in the middle of the screen and return its rect."""
+    return surface.blit(image, (settings.SCREEN_SIZE[0] / 2 - 528 / 2, settings.SCREEN_SIZE[1] / 2 - 294 / 2))
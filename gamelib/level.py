@@ -0,0 +1,158 @@
+'''Compiled level format.
+
+Text maps (data/map.txt) are compiled once into a compact binary file that
+is memory-mapped on load:
+
+  header    magic, format version, columns, rows, spawn count, md5 of source
+  tiles     rows x columns bytes, EMPTY / GROUND / BLOCK
+  ground    rows x columns bytes, ground image variant (1-6), 0 for none
+  borders   rows x columns bytes, neighbour mask of every block (grid.LEFT...)
+  spawns    spawn count x (kind, column, row)
+
+Compiled files live in LEVEL_CACHE_DIR and are rebuilt only when the md5 of
+the source text no longer matches the one in the header.
+'''
+
+# core
+import hashlib
+import mmap
+import os
+import random
+import struct
+import tempfile
+
+# 3rd party
+import numpy as np
+
+# local
+import grid
+import settings
+
+
+MAGIC = b'PMLV'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHI16s')
+SPAWN = struct.Struct('<cHH')
+
+EMPTY = 0
+GROUND = 1
+BLOCK = 2
+
+SPAWN_KINDS = 'EBW12'  # enemy, star, weapon, mission notifications
+GROUND_VARIANTS = 6
+
+
+class Level(object):
+    def __init__(self, columns, rows, tiles, ground, borders, spawns, buffer=None):
+        self.columns = columns
+        self.rows = rows
+        self.tiles = tiles
+        self.ground = ground
+        self.borders = borders
+        self.spawns = spawns
+        self.buffer = buffer  # keeps the mmap alive as long as the arrays
+
+
+def parse(text, seed=3):
+    lines = text.splitlines(True)
+    rows = len(lines)
+    columns = max(len(line) for line in lines) if lines else 0
+    tiles = np.zeros((rows, columns), dtype=np.uint8)
+    ground = np.zeros((rows, columns), dtype=np.uint8)
+    spawns = []
+    rng = random.Random(seed)  # to make ground load the same, but "random"
+    for row, line in enumerate(lines):
+        # every character except '#' is walkable ground, line breaks included
+        for column, char in enumerate(line):
+            if char == '#':
+                tiles[row, column] = BLOCK
+                continue
+            if char in SPAWN_KINDS:
+                spawns.append((char, column, row))
+            tiles[row, column] = GROUND
+            ground[row, column] = rng.randint(1, GROUND_VARIANTS)
+    return Level(columns, rows, tiles, ground, borders(tiles), spawns)
+
+
+def borders(tiles):
+    blocks = np.pad(tiles == BLOCK, 1, mode='constant')
+    mask = np.zeros(tiles.shape, dtype=np.uint8)
+    mask[blocks[1:-1, :-2]] |= grid.LEFT
+    mask[blocks[1:-1, 2:]] |= grid.RIGHT
+    mask[blocks[:-2, 1:-1]] |= grid.TOP
+    mask[blocks[2:, 1:-1]] |= grid.BOTTOM
+    mask[tiles != BLOCK] = 0
+    return mask
+
+
+def write(level, path, digest):
+    # written next to the final file and renamed into place, so a crash
+    # never leaves a partial file with a valid header behind
+    fd, temp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, level.columns, level.rows, len(level.spawns), digest))
+            for array in (level.tiles, level.ground, level.borders):
+                f.write(array.astype(np.uint8).tobytes())
+            for kind, column, row in level.spawns:
+                f.write(SPAWN.pack(kind.encode('ascii'), column, row))
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)  # rename does not replace files on Windows
+        os.rename(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, columns, rows, spawn_count, digest = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        return None, None
+    size = columns * rows
+    if len(buffer) != HEADER.size + 3 * size + spawn_count * SPAWN.size:
+        return None, None  # truncated or padded
+    arrays = [np.frombuffer(buffer, np.uint8, size, HEADER.size + i * size).reshape(rows, columns)
+              for i in range(3)]
+    offset = HEADER.size + 3 * size
+    spawns = []
+    for i in range(spawn_count):
+        kind, column, row = SPAWN.unpack_from(buffer, offset + i * SPAWN.size)
+        spawns.append((kind.decode('ascii'), column, row))
+    return Level(columns, rows, arrays[0], arrays[1], arrays[2], spawns, buffer), digest
+
+
+def cache_path(source, cache_dir=None):
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(cache_dir or settings.LEVEL_CACHE_DIR, name + '.lvl')
+
+
+def load(source, cache_dir=None, cache=True):
+    """Return the Level for a text map, compiling it first if needed.
+
+    Compiled files go to cache_dir, LEVEL_CACHE_DIR by default; with cache
+    False the text is always parsed and nothing is written.
+    """
+    with open(source, 'rb') as f:
+        text = f.read()
+    digest = hashlib.md5(text).digest()
+    if not cache:
+        return parse(text.decode('ascii'))
+    compiled = cache_path(source, cache_dir)
+    if os.path.exists(compiled):
+        try:
+            level, compiled_digest = read(compiled)
+        except (ValueError, struct.error, EnvironmentError):
+            level = None  # damaged, compile it again
+        if level is not None and compiled_digest == digest:
+            return level
+    level = parse(text.decode('ascii'))
+    try:
+        directory = os.path.dirname(compiled)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        write(level, compiled, digest)
+    except EnvironmentError:
+        pass  # read-only install, keep using the parsed level
+    return level
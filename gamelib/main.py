@@ -1,4 +1,5 @@
 # core
+import argparse
 import os
 import sys
 
@@ -6,17 +7,88 @@ import sys
 import pygame as pg
 
 # local
+import recording
 import settings
-from gamelib.game import Game
+from gamelib.game import Game, Inputs
+from gamelib.profiler import FrameProfiler
 
 
-def main():
-    os.environ['SDL_VIDEO_CENTERED'] = '1'
+def init(headless=False):
+    if headless:
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'  # no window, no GPU needed
+    else:
+        os.environ['SDL_VIDEO_CENTERED'] = '1'
     pg.init()
     pg.display.set_caption(settings.SCREEN_TITLE)
     pg.display.set_mode(settings.SCREEN_SIZE)
 
-    Game().main_loop()
+
+def main():
+    parser = argparse.ArgumentParser(description=settings.SCREEN_TITLE)
+    parser.add_argument('--record', metavar='PATH', help='record the inputs of the game to PATH')
+    args = parser.parse_args()
+
+    init()
+
+    recorder = recording.Recorder(args.record, settings.SEED) if args.record else None
+    try:
+        Game(recorder=recorder).main_loop()
+    finally:
+        if recorder:
+            recorder.close()
 
     pg.quit()
     sys.exit()
+
+
+def simulate(ticks, dt=None, inputs=None):
+    """Run the game logic headlessly for a number of fixed dt steps.
+
+    dt defaults to the step length of the main loop, 1 / TICK_RATE.
+
+    inputs is either None, an Inputs used for every step, or a callable
+    taking (game, tick) and returning the Inputs for that step.
+    """
+    init(headless=True)
+    game = Game()
+    game.start()
+    dt = dt or game.step_time
+    try:
+        for tick in range(ticks):
+            if game.done:
+                break
+            if callable(inputs):
+                step_inputs = inputs(game, tick)
+            else:
+                step_inputs = inputs or Inputs()
+            game.step(step_inputs, dt)
+    finally:
+        game.close()
+    return game
+
+
+def replay(path, map_path=None, draw=True):
+    """Replay a recording headlessly, step for step.
+
+    Every step is one profiler frame, so game.profiler holds the frame
+    times of the whole session afterwards.
+    """
+    session = recording.read(path)
+    init(headless=True)
+    game = Game(seed=session.seed)
+    game.profiler = FrameProfiler(window=max(1, len(session.steps)))
+    game.start(map_path)
+    dt = 1.0 / session.tick_rate
+    try:
+        for inputs in session.steps:
+            if game.done:
+                break
+            game.profiler.begin_frame()
+            game.step(inputs, dt)
+            if draw:
+                with game.profiler.phase('draw'):
+                    game.draw()
+    finally:
+        game.close()
+    game.profiler.begin_frame()  # ends the last frame
+    return game
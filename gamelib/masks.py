@@ -0,0 +1,56 @@
+# 3rd party
+import pygame as pg
+
+
+TRANSPARENT = (0, 0, 0, 0)
+
+
+class MaskCache(object):
+    """Builds every collision mask once and hands out the shared Mask.
+
+    Masks are either a filled hitbox rect inside an otherwise empty area,
+    keyed by (size, hitbox), or made from an image, keyed by the image.
+    Shared masks must never be drawn onto.
+    """
+
+    def __init__(self):
+        self.masks = {}
+        self.hits = 0
+        self.builds = 0
+
+    def hitbox(self, size, hitbox=None):
+        hitbox = pg.Rect(hitbox or ((0, 0), size))
+        key = (tuple(size), tuple(hitbox))
+        mask = self.masks.get(key)
+        if mask is not None:
+            self.hits += 1
+            return mask
+        self.builds += 1
+        surface = pg.Surface(size).convert_alpha()
+        surface.fill(TRANSPARENT)
+        surface.fill(pg.Color("white"), hitbox)
+        mask = self.masks[key] = pg.mask.from_surface(surface)
+        return mask
+
+    def image(self, image):
+        mask = self.masks.get(image)
+        if mask is not None:
+            self.hits += 1
+            return mask
+        self.builds += 1
+        mask = self.masks[image] = pg.mask.from_surface(image)
+        return mask
+
+    def stats(self):
+        return {'masks': len(self.masks), 'hits': self.hits, 'builds': self.builds}
+
+
+cache = MaskCache()
+
+
+def hitbox(size, hitbox=None):
+    return cache.hitbox(size, hitbox)
+
+
+def from_image(image):
+    return cache.image(image)
@@ -0,0 +1,113 @@
+# core
+import random
+
+# 3rd party
+import numpy as np
+
+# local
+import level
+import settings
+from enemies import VECTORS
+
+
+def exits(walkable):
+    """Bit 1 << heading set for every walkable neighbour of a walkable tile."""
+    padded = np.pad(walkable, 1, mode='constant')
+    rows, columns = walkable.shape
+    mask = np.zeros(walkable.shape, dtype=np.uint8)
+    for heading, (dx, dy) in enumerate(VECTORS.tolist()):
+        mask[padded[1 + dy:1 + dy + rows, 1 + dx:1 + dx + columns]] |= 1 << heading
+    mask[~walkable] = 0
+    return mask
+
+
+class Navigation(object):
+    """Grid graph of the walkable tiles and a flow field toward the player.
+
+    The flow field holds, for every tile within `radius` tiles of the
+    target, the heading (an index into enemies.DIRECTIONS) of the next tile
+    on a shortest path to it. It is rebuilt only when the target moves to
+    another tile, so following it costs one array lookup per enemy.
+    """
+
+    def __init__(self, level_data, radius=settings.NAV_RADIUS, rng=random):
+        self.tile_size = settings.TILE_SIZE
+        self.columns = level_data.columns
+        self.rows = level_data.rows
+        self.walkable = np.array(level_data.tiles != level.BLOCK)
+        self.exits = exits(self.walkable)
+        self.radius = radius
+        self.rng = rng
+        self.target = None
+        self.origin = np.zeros(2, dtype=np.int32)  # column, row of flow[0, 0]
+        self.flow = np.zeros((0, 0), dtype=np.int8)
+
+    def update(self, point):
+        cell = (int(point[0]) // self.tile_size, int(point[1]) // self.tile_size)
+        if cell != self.target:
+            self.target = cell
+            self.build(cell)
+
+    def build(self, cell):
+        column, row = cell
+        left, top = max(0, column - self.radius), max(0, row - self.radius)
+        right = min(self.columns, column + self.radius + 1)
+        bottom = min(self.rows, row + self.radius + 1)
+        self.origin = np.array((left, top), dtype=np.int32)
+        walkable = self.walkable[top:bottom, left:right]
+        self.flow = np.full(walkable.shape, -1, dtype=np.int8)
+        if not (left <= column < right and top <= row < bottom):
+            return
+
+        # breadth first wavefront from the target, one ring of tiles per pass
+        distance = np.full(walkable.shape, -1, dtype=np.int32)
+        frontier = np.zeros(walkable.shape, dtype=bool)
+        frontier[row - top, column - left] = True
+        distance[frontier] = 0
+        step = 0
+        while frontier.any():
+            step += 1
+            grown = np.zeros_like(frontier)
+            grown[1:, :] |= frontier[:-1, :]
+            grown[:-1, :] |= frontier[1:, :]
+            grown[:, 1:] |= frontier[:, :-1]
+            grown[:, :-1] |= frontier[:, 1:]
+            frontier = grown & walkable & (distance < 0)
+            distance[frontier] = step
+
+        padded = np.pad(distance, 1, mode='constant', constant_values=-1)
+        rows, columns = distance.shape
+        for heading, (dx, dy) in enumerate(VECTORS.tolist()):
+            neighbour = padded[1 + dy:1 + dy + rows, 1 + dx:1 + dx + columns]
+            closer = (distance > 0) & (neighbour == distance - 1) & (self.flow < 0)
+            self.flow[closer] = heading
+
+    def headings(self, cells):
+        """Flow field heading for every (column, row) in cells, -1 where there is none."""
+        cells = cells - self.origin
+        rows, columns = self.flow.shape
+        inside = ((cells[:, 0] >= 0) & (cells[:, 0] < columns) &
+                  (cells[:, 1] >= 0) & (cells[:, 1] < rows))
+        result = np.full(len(cells), -1, dtype=np.int8)
+        result[inside] = self.flow[cells[inside, 1], cells[inside, 0]]
+        return result
+
+    def is_open(self, cells, headings):
+        """True where the tile next to each cell in the given heading is walkable."""
+        columns = np.clip(cells[:, 0], 0, self.columns - 1)
+        rows = np.clip(cells[:, 1], 0, self.rows - 1)
+        return (self.exits[rows, columns] >> headings.astype(np.uint8)) & 1 == 1
+
+    def patrol(self, cell, heading):
+        """A random open heading from cell, turning back only at dead ends.
+
+        Returns -1 when the tile has no exit at all.
+        """
+        column, row = cell
+        if not (0 <= column < self.columns and 0 <= row < self.rows):
+            return -1
+        exits = self.exits[row, column]
+        choices = [h for h in range(4) if exits & (1 << h) and h != (heading + 2) % 4]
+        if not choices:
+            choices = [h for h in range(4) if exits & (1 << h)]
+        return self.rng.choice(choices) if choices else -1
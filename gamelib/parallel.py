@@ -0,0 +1,127 @@
+'''Optional multi-process enemy simulation.
+
+With ENEMY_WORKERS set, the EnemyStore arrays live in shared memory and
+every step the active enemies are split into vertical bands of the map,
+one per worker process, which advance them in place with
+enemies.advance(). Bands never share a slot, so the workers need no
+locking; the main thread waits for all of them before it goes on, and
+rendering never leaves it.
+
+Patrol turns use a random stream per band and step instead of the game's
+patrol stream, so a parallel run repeats itself but does not match a
+serial one.
+'''
+
+# core
+import multiprocessing
+import random
+
+# 3rd party
+import numpy as np
+
+# local
+import enemies
+import settings
+from enemies import EnemyStore
+
+
+class SharedEnemyStore(EnemyStore):
+    """EnemyStore whose arrays are backed by shared memory."""
+
+    def __init__(self, capacity=64):
+        self.buffers = {}  # field name -> (RawArray, shape, dtype)
+        self.generation = 0  # bumped when the arrays are replaced
+        EnemyStore.__init__(self, capacity)
+
+    def allocate(self, name, shape, dtype):
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        raw = multiprocessing.RawArray('b', max(1, count * dtype.itemsize))  # zero filled
+        self.buffers[name] = (raw, shape, dtype.str)
+        return np.frombuffer(raw, dtype=dtype, count=count).reshape(shape)
+
+    def grow(self, capacity):
+        EnemyStore.grow(self, capacity)
+        self.generation += 1
+
+
+class Arrays(object):
+    """The store fields of a worker, attached to the shared buffers."""
+
+    def __init__(self, buffers):
+        for name, (raw, shape, dtype) in buffers.items():
+            count = int(np.prod(shape))
+            setattr(self, name, np.frombuffer(raw, dtype=np.dtype(dtype), count=count).reshape(shape))
+
+
+_arrays = None
+_navigation = None
+
+
+def _init_worker(buffers, navigation):
+    global _arrays, _navigation
+    _arrays = Arrays(buffers)
+    _navigation = navigation
+
+
+def _advance(task):
+    slots, flow, dt, now, seed = task
+    _navigation.target, _navigation.origin, _navigation.flow = flow
+    _navigation.rng = random.Random(seed)
+    enemies.advance(_arrays, slots, _navigation, dt, now)
+
+
+class EnemyPool(object):
+    """Advances the enemies of a SharedEnemyStore in worker processes.
+
+    Batches smaller than `threshold` are not worth the round trip and are
+    advanced on the main thread.
+    """
+
+    def __init__(self, store, navigation, width, workers=settings.ENEMY_WORKERS,
+                 threshold=settings.ENEMY_WORKER_THRESHOLD, seed=settings.SEED):
+        self.store = store
+        self.navigation = navigation
+        self.width = width  # map width in pixels
+        self.workers = workers
+        self.threshold = threshold
+        self.seed = seed
+        self.steps = 0
+        self.pool = None
+        self.generation = None
+
+    def start(self):
+        # workers attach to the arrays they were started with, so a store
+        # that grew needs new workers
+        self.close()
+        self.pool = multiprocessing.Pool(self.workers, _init_worker,
+                                         (self.store.buffers, self.navigation))
+        self.generation = self.store.generation
+
+    def update(self, active, dt, now):
+        if not active:
+            return
+        self.steps += 1
+        slots = np.array([enemy.slot for enemy in active])
+        if len(slots) < self.threshold:
+            enemies.advance(self.store, slots, self.navigation, dt, now)
+            return
+        if self.pool is None or self.generation != self.store.generation:
+            self.start()
+
+        nav = self.navigation
+        flow = (nav.target, nav.origin, nav.flow)
+        bands = np.clip(self.store.pos[slots, 0] * self.workers // max(1, self.width), 0, self.workers - 1)
+        tasks = []
+        for band in range(self.workers):
+            chunk = slots[bands == band]
+            if len(chunk):
+                seed = '%s/%d/%d' % (self.seed, self.steps, band)
+                tasks.append((chunk, flow, dt, now, seed))
+        self.pool.map(_advance, tasks)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
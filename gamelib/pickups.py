@@ -0,0 +1,143 @@
+'''Stars, the weapon and the mission notices, kept as ecs entities.
+
+Every pickup has a `rect` (x, y, width, height) and a `pickup` kind.
+Stars and the weapon also have a `sprite`; notices are invisible triggers
+with the `notice` number to show.
+
+Pickups are also kept in a TriggerIndex by the map cells they cover, so
+only the few near the player are tested each step, and touching one calls
+the handler registered in HANDLERS for its kind.
+'''
+
+# 3rd party
+import numpy as np
+
+# local
+import assets
+import settings
+
+
+STAR = 0
+WEAPON = 1
+NOTICE = 2
+
+
+class TriggerIndex(object):
+    """Pickup entities by the (column, row) map cells their rect covers."""
+
+    def __init__(self, tile_size=settings.TILE_SIZE):
+        self.tile_size = tile_size
+        self.cells = {}  # cell -> entities, in spawn order
+        self.entity_cells = {}  # entity -> cells it is listed in
+
+    def cells_of(self, rect):
+        size = self.tile_size
+        x, y, w, h = rect
+        return [(column, row)
+                for row in range(y // size, (y + h - 1) // size + 1)
+                for column in range(x // size, (x + w - 1) // size + 1)]
+
+    def add(self, entity, rect):
+        cells = self.entity_cells[entity] = self.cells_of(rect)
+        for cell in cells:
+            self.cells.setdefault(cell, []).append(entity)
+
+    def remove(self, entity):
+        for cell in self.entity_cells.pop(entity, ()):
+            entities = self.cells[cell]
+            entities.remove(entity)
+            if not entities:
+                del self.cells[cell]
+
+    def __contains__(self, entity):
+        return entity in self.entity_cells
+
+    def candidates(self, rect):
+        """Entities listed in any cell rect covers, each once."""
+        found = []
+        seen = set()
+        for cell in self.cells_of(rect):
+            for entity in self.cells.get(cell, ()):
+                if entity not in seen:
+                    seen.add(entity)
+                    found.append(entity)
+        return found
+
+
+def register(world):
+    world.register('rect', np.int32, 4)
+    world.register('sprite', object)
+    world.register('pickup', np.int8)
+    world.register('notice', np.int8)
+    world.add_system(trigger_system)
+
+
+def spawn(world, triggers, char, column, row):
+    """Create and index the pickup for a 'B', 'W', '1' or '2' map spawn."""
+    if char == 'B':
+        image = assets.image("star.png")
+        rect = (column*50 + 20, row*50 + 20) + image.get_size()
+        entity = world.create(rect=rect, sprite=image, pickup=STAR)
+    elif char == 'W':
+        image = assets.image("weapon.png")
+        rect = (column*50 + 15, row*50 + 15) + image.get_size()
+        entity = world.create(rect=rect, sprite=image, pickup=WEAPON)
+    elif char in '12':
+        # the trigger area is as large as the notice image
+        rect = (column*50 + 15, row*50 + 15) + assets.image("notification" + char + ".png").get_size()
+        entity = world.create(rect=rect, pickup=NOTICE, notice=int(char))
+    else:
+        return None
+    triggers.add(entity, rect)
+    return entity
+
+
+def remove(world, game, entity):
+    game.triggers.remove(entity)
+    world.destroy(entity)
+
+
+def refill_ammo(world, game, entity):
+    player = game.player
+    if player.weapon and player.bullets_left < player.max_bullets:
+        player.bullets_left = player.max_bullets
+        remove(world, game, entity)
+
+
+def take_weapon(world, game, entity):
+    if not game.player.weapon:
+        game.player.take_weapon(game.ticks)
+        remove(world, game, entity)
+        game.show_notification = 2
+
+
+def show_notice(world, game, entity):
+    # an unarmed player touching a notice gets to read it, once
+    if game.player.weapon:
+        return
+    game.show_notification = int(world['notice'].get(entity))
+    for notice in world['notice'].ids().tolist():
+        remove(world, game, notice)
+
+
+HANDLERS = {STAR: refill_ammo,
+            WEAPON: take_weapon,
+            NOTICE: show_notice}
+
+
+def trigger_system(world, game):
+    rect = game.player.rect
+    for entity in game.triggers.candidates(rect):
+        if entity not in game.triggers:
+            continue  # removed by an earlier handler this step
+        if rect.colliderect(world['rect'].get(entity).tolist()):
+            HANDLERS[int(world['pickup'].get(entity))](world, game, entity)
+
+
+def draw(world, triggers, surface, view):
+    """Draw the pickups listed in the cells of the render.Viewport view."""
+    sprites = world['sprite']
+    for entity in triggers.candidates(view.rect):
+        if entity in sprites:
+            x, y = world['rect'].get(entity)[:2]
+            surface.blit(sprites.get(entity), (int(x) + view.x, int(y) + view.y))
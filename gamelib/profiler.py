@@ -0,0 +1,101 @@
+# core
+import csv
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 3rd party
+import pygame as pg
+
+
+PHASES = ['event_loop', 'enemies', 'player', 'update', 'ai', 'draw', 'flip']
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
+
+
+class FrameProfiler(object):
+    """Times every phase of the main loop for the last `window` frames.
+
+    A frame is the wall time between two begin_frame() calls, so it also
+    includes the time spent waiting in clock.tick.
+    """
+
+    def __init__(self, window=300, phases=PHASES):
+        self.phases = phases
+        self.frames = deque(maxlen=window)
+        self.current = None
+        self.frame_start = None
+        self.visible = False
+
+    def begin_frame(self):
+        now = time.time()
+        if self.current is not None:
+            self.current['frame'] = (now - self.frame_start) * 1000
+            self.frames.append(self.current)
+        self.current = dict.fromkeys(self.phases, 0.0)
+        self.frame_start = now
+
+    @contextmanager
+    def phase(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            if self.current is not None:
+                self.current[name] = self.current.get(name, 0.0) + (time.time() - start) * 1000
+
+    def samples(self, name):
+        return [frame[name] for frame in self.frames]
+
+    def stats(self):
+        stats = {}
+        for name in self.phases + ['frame']:
+            values = self.samples(name)
+            stats[name] = {'p50': percentile(values, 50),
+                           'p95': percentile(values, 95),
+                           'p99': percentile(values, 99),
+                           'max': max(values) if values else 0.0}
+        return stats
+
+    def dump(self, path):
+        columns = ['frame'] + self.phases
+        if path.endswith('.csv'):
+            with open(path, 'wb') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                for frame in self.frames:
+                    writer.writerow(['%.3f' % frame[name] for name in columns])
+        else:
+            with open(path, 'w') as f:
+                json.dump({'stats': self.stats(), 'frames': list(self.frames)}, f, indent=2)
+
+    def draw(self, surface, font, budget=1000/60.0):
+        stats = self.stats()
+        panel = pg.Rect(10, 40, 300, 26 + 16 * (len(self.phases) + 1) + 60)
+        overlay = pg.Surface(panel.size)
+        overlay.set_alpha(190)
+        overlay.fill((20, 20, 20))
+        surface.blit(overlay, panel)
+
+        color = (250, 250, 250)
+        surface.blit(font.render('phase      p50    p95    max (ms)', 1, color), (panel.x + 6, panel.y + 4))
+        for i, name in enumerate(['frame'] + self.phases):
+            line = '%-11s %5.2f  %5.2f  %5.2f' % (name, stats[name]['p50'], stats[name]['p95'], stats[name]['max'])
+            surface.blit(font.render(line, 1, color), (panel.x + 6, panel.y + 22 + 16 * i))
+
+        # frame time graph, the red line is the frame budget
+        graph = pg.Rect(panel.x + 6, panel.bottom - 56, panel.width - 12, 50)
+        scale = graph.height / (budget * 2)
+        pg.draw.line(surface, (200, 60, 60), (graph.left, graph.bottom - budget * scale),
+                     (graph.right, graph.bottom - budget * scale))
+        times = self.samples('frame')[-graph.width:]
+        if len(times) > 1:
+            points = [(graph.left + i, graph.bottom - min(graph.height, t * scale))
+                      for i, t in enumerate(times)]
+            pg.draw.lines(surface, (120, 220, 120), False, points)
@@ -0,0 +1,87 @@
+'''Recorded play sessions.
+
+A recording holds the Inputs of every simulation step of one game, so the
+game can be replayed step for step (see main.replay):
+
+  header    magic, format version, seed, tick rate
+  steps     flags, held directions, mouse x, mouse y
+
+The low three bits of flags are the number of held directions, the others
+are FIRE, CONFIRM and MOUSE. Held directions are packed two bits each,
+oldest first, as indices into enemies.DIRECTIONS.
+'''
+
+# core
+import struct
+
+# local
+import settings
+from enemies import DIRECTIONS, HEADING
+from game import Inputs
+
+
+MAGIC = b'PMRP'
+VERSION = 1
+HEADER = struct.Struct('<4sHIH')
+STEP = struct.Struct('<BBhh')
+
+FIRE = 8
+CONFIRM = 16
+MOUSE = 32
+
+
+def pack(inputs):
+    flags = len(inputs.directions)
+    directions = 0
+    for i, key in enumerate(inputs.directions):
+        directions |= HEADING[key] << (2 * i)
+    if inputs.fire:
+        flags |= FIRE
+    if inputs.confirm:
+        flags |= CONFIRM
+    if inputs.mouse is not None:
+        flags |= MOUSE
+    x, y = inputs.mouse or (0, 0)
+    return STEP.pack(flags, directions, x, y)
+
+
+def unpack(data, offset=0):
+    flags, directions, x, y = STEP.unpack_from(data, offset)
+    return Inputs([DIRECTIONS[(directions >> (2 * i)) & 3] for i in range(flags & 7)],
+                  (x, y) if flags & MOUSE else None,
+                  bool(flags & FIRE),
+                  bool(flags & CONFIRM))
+
+
+class Recorder(object):
+    """Writes the Inputs of every step to path as the game runs."""
+
+    def __init__(self, path, seed, tick_rate=settings.TICK_RATE):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, tick_rate))
+        self.steps = 0
+
+    def record(self, inputs):
+        self.file.write(pack(inputs))
+        self.steps += 1
+
+    def close(self):
+        self.file.close()
+
+
+class Recording(object):
+    def __init__(self, seed, tick_rate, steps):
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.steps = steps  # Inputs of every step
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, seed, tick_rate = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('%s is not a version %d recording' % (path, VERSION))
+    count = (len(data) - HEADER.size) // STEP.size
+    steps = [unpack(data, HEADER.size + i * STEP.size) for i in range(count)]
+    return Recording(seed, tick_rate, steps)
@@ -0,0 +1,134 @@
+# core
+from collections import OrderedDict
+
+# 3rd party
+import pygame as pg
+
+# local
+import assets
+import settings
+from level import BLOCK
+
+
+def ground_images():
+    # indexed by the ground variant stored in the compiled level, 0 is no ground
+    return [None] + [assets.image("ground%d.png" % i) for i in range(1, 7)]
+
+
+class Viewport(object):
+    """The part of the map on screen during one frame.
+
+    Worked out once per frame from the camera, so draw passes can go
+    through the visible tiles, or look things up in a spatial index by
+    `rect`, instead of testing every object against the screen.
+    """
+
+    def __init__(self, camera, size, columns, rows, tile_size=settings.TILE_SIZE):
+        self.x, self.y = camera.state.topleft  # map to screen offset
+        self.rect = pg.Rect((-self.x, -self.y), size)  # in map pixels
+        self.columns = range(max(0, self.rect.left // tile_size),
+                             min(columns, (self.rect.right - 1) // tile_size + 1))
+        self.rows = range(max(0, self.rect.top // tile_size),
+                          min(rows, (self.rect.bottom - 1) // tile_size + 1))
+
+
+def draw_ground(surface, view, level):
+    """Blit the ground tiles inside the viewport straight from the level arrays."""
+    size = settings.TILE_SIZE
+    images = ground_images()
+    for row in view.rows:
+        variants = level.ground[row]
+        for column in view.columns:
+            if variants[column]:
+                surface.blit(images[variants[column]], (column * size + view.x, row * size + view.y))
+
+
+class StaticLayer(object):
+    """Map tiles that never change, baked into chunk surfaces on demand.
+
+    Drawing blits only the part of each chunk that falls inside the
+    viewport, so the cost per frame does not depend on the map size. Chunks
+    are baked the first time they are seen and the least recently drawn
+    ones are dropped once more than max_chunks exist.
+    """
+
+    def __init__(self, level, block_image, chunk_size=settings.STATIC_CHUNK_SIZE,
+                 max_chunks=settings.STATIC_MAX_CHUNKS):
+        self.level = level
+        self.block_image = block_image  # neighbour mask -> block image
+        self.rect = pg.Rect(0, 0, level.columns * settings.TILE_SIZE, level.rows * settings.TILE_SIZE)
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.chunks = OrderedDict()  # least recently drawn first
+        self.ground = ground_images()
+
+    def bake(self, key):
+        size = self.chunk_size
+        tile = settings.TILE_SIZE
+        chunk_rect = pg.Rect(key[0] * size, key[1] * size, size, size).clip(self.rect)
+        chunk = pg.Surface(chunk_rect.size).convert()
+        chunk.fill((0, 0, 0))
+
+        columns = slice(chunk_rect.left // tile, (chunk_rect.right - 1) // tile + 1)
+        rows = slice(chunk_rect.top // tile, (chunk_rect.bottom - 1) // tile + 1)
+        ground = self.level.ground[rows, columns].tolist()
+        tiles = self.level.tiles[rows, columns].tolist()
+        borders = self.level.borders[rows, columns].tolist()
+        for row, (variants, kinds, masks) in enumerate(zip(ground, tiles, borders)):
+            y = (rows.start + row) * tile - chunk_rect.y
+            for column, variant in enumerate(variants):
+                x = (columns.start + column) * tile - chunk_rect.x
+                if kinds[column] == BLOCK:
+                    chunk.blit(self.block_image(masks[column]), (x, y))
+                elif variant:
+                    chunk.blit(self.ground[variant], (x, y))
+        return chunk_rect, chunk
+
+    def chunk(self, key):
+        chunk = self.chunks.pop(key, None)
+        if chunk is None:
+            chunk = self.bake(key)
+            while len(self.chunks) >= self.max_chunks:
+                self.chunks.popitem(last=False)
+        self.chunks[key] = chunk  # most recently drawn
+        return chunk
+
+    def draw(self, surface, camera):
+        view = surface.get_rect(topleft=(-camera.state.x, -camera.state.y)).clip(self.rect)
+        size = self.chunk_size
+        for cx in range(view.left // size, (view.right - 1) // size + 1):
+            for cy in range(view.top // size, (view.bottom - 1) // size + 1):
+                chunk_rect, chunk_surface = self.chunk((cx, cy))
+                area = view.clip(chunk_rect)
+                dest = (area.x + camera.state.x, area.y + camera.state.y)
+                area.move_ip(-chunk_rect.x, -chunk_rect.y)
+                surface.blit(chunk_surface, dest, area)
+
+
+class RotationCache(object):
+    """Pre-rotated copies of images, quantised to a fixed number of angles.
+
+    Subsurfaces cut from the same place of the same sheet share their
+    rotations, so sprites that slice their own frames still hit the cache.
+    """
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.images = {}
+
+    def key(self, image):
+        return (image.get_abs_parent(), image.get_abs_offset(), image.get_size())
+
+    def prepare(self, image):
+        key = self.key(image)
+        rotated = self.images.get(key)
+        if rotated is None:
+            step = 360.0 / self.steps
+            rotated = self.images[key] = [pg.transform.rotate(image, i * step) for i in range(self.steps)]
+        return rotated
+
+    def bucket(self, angle):
+        return int(round(angle * self.steps / 360.0)) % self.steps
+
+    def rotate(self, image, angle):
+        return self.prepare(image)[self.bucket(angle)]
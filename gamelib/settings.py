@@ -4,6 +4,8 @@ import os
 
 # Gameplay
 SCREEN_SIZE = (960, 640)
+TILE_SIZE = 50  # map.txt cell size in pixels
+SEED = 3  # seeds the random streams of every game, see game.rng_streams
 
 # Texts
 SCREEN_TITLE = "Poor man Medal Of Honor Game"
@@ -12,3 +14,32 @@ SCREEN_TITLE = "Poor man Medal Of Honor Game"
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
 IMG_DIR = os.path.join(DATA_DIR, 'img')
 FONTS_DIR = os.path.join(DATA_DIR, 'fonts')
+MAP_PATH = os.path.join(DATA_DIR, 'map.txt')
+LEVEL_CACHE_DIR = os.path.join(DATA_DIR, 'cache')  # compiled maps, see level.py
+
+# World streaming
+CHUNK_TILES = 16          # chunk edge in tiles
+MAX_CHUNKS = 48           # loaded chunks kept before the least recently used is dropped
+
+# Timing
+TICK_RATE = 60            # fixed simulation steps per second of game time
+MAX_FPS = 60              # render frame cap, 0 for uncapped
+MAX_FRAME_STEPS = 5       # steps caught up per frame at most, older lag is dropped
+
+# Rendering
+STATIC_LAYER = True       # bake ground and blocks into chunk surfaces
+STATIC_CHUNK_SIZE = CHUNK_TILES * TILE_SIZE   # chunk edge in pixels
+# baked chunks kept: the most one screen can overlap, plus a row and a column of margin
+STATIC_MAX_CHUNKS = ((SCREEN_SIZE[0] // STATIC_CHUNK_SIZE + 3) *
+                     (SCREEN_SIZE[1] // STATIC_CHUNK_SIZE + 3))
+ROTATION_STEPS = 64       # pre-rotated angles kept per player/bullet image
+
+# Enemy AI
+AI_RATE = 20              # vision updates per second of game time, 0 for every step
+NAV_RADIUS = 6            # enemies within this many tiles of the player chase it
+ENEMY_WORKERS = 0         # worker processes advancing enemies, 0 to keep them on the main thread
+ENEMY_WORKER_THRESHOLD = 500  # fewer active enemies than this are advanced on the main thread
+
+# Profiling (F3 toggles the overlay, F4 dumps the samples)
+PROFILE_WINDOW = 300                  # frames kept for the percentiles
+PROFILE_DUMP = 'frame_profile.json'   # .json or .csv
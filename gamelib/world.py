@@ -0,0 +1,121 @@
+# core
+from collections import OrderedDict
+
+# 3rd party
+import numpy as np
+
+# local
+import level
+import settings
+from grid import TileGrid
+
+
+class ChunkedWorld(object):
+    """Streams the map in square chunks around the camera.
+
+    Blocks of a chunk only exist as sprites while the chunk is loaded, and
+    enemies are spawned the first time their chunk is loaded. Only enemies
+    inside active chunks (the viewport plus a margin of one chunk) are
+    simulated. Loaded chunks that are no longer active are kept in LRU order
+    and unloaded once more than `max_chunks` are loaded.
+
+    Blocks and enemies are created through the make_block(column, row) and
+    make_enemy(column, row) callables, so this module knows nothing about
+    the sprite classes.
+    """
+
+    def __init__(self, level_data, make_block, make_enemy,
+                 chunk_tiles=settings.CHUNK_TILES, max_chunks=settings.MAX_CHUNKS):
+        self.level = level_data
+        self.make_block = make_block
+        self.make_enemy = make_enemy
+        self.chunk_tiles = chunk_tiles
+        self.chunk_size = chunk_tiles * settings.TILE_SIZE
+        self.max_chunks = max_chunks
+        self.grid = TileGrid(level_data.columns, level_data.rows,
+                             occupied=np.array(level_data.tiles == level.BLOCK))
+
+        self.spawns = {}  # chunk -> enemy spawn cells not spawned yet
+        for kind, column, row in level_data.spawns:
+            if kind == 'E':
+                self.spawns.setdefault(self.chunk_of_cell(column, row), []).append((column, row))
+
+        self.loaded = OrderedDict()  # chunk -> block sprites, least recently used first
+        self.active = []
+        self.enemies = {}  # chunk -> OrderedDict of the enemies inside it, in arrival order
+        self.enemy_chunk = {}  # enemy -> chunk it was last seen in
+
+    def chunk_of_cell(self, column, row):
+        return (column // self.chunk_tiles, row // self.chunk_tiles)
+
+    def chunk_of(self, rect):
+        return (rect.centerx // self.chunk_size, rect.centery // self.chunk_size)
+
+    def chunks_around(self, view):
+        size = self.chunk_size
+        last_x = (self.level.columns - 1) // self.chunk_tiles
+        last_y = (self.level.rows - 1) // self.chunk_tiles
+        return [(cx, cy)
+                for cx in range(max(0, view.left // size - 1), min(last_x, (view.right - 1) // size + 1) + 1)
+                for cy in range(max(0, view.top // size - 1), min(last_y, (view.bottom - 1) // size + 1) + 1)]
+
+    def update(self, view):
+        """Load the chunks around view and unload the least recently used ones."""
+        self.active = self.chunks_around(view)
+        for key in self.active:
+            if key in self.loaded:
+                self.loaded[key] = self.loaded.pop(key)  # mark as most recently used
+            else:
+                self.load(key)
+        while len(self.loaded) > max(self.max_chunks, len(self.active)):
+            key = next(iter(self.loaded))
+            self.unload(key, self.loaded.pop(key))
+
+    def load(self, key):
+        first_column, first_row = key[0] * self.chunk_tiles, key[1] * self.chunk_tiles
+        tiles = self.level.tiles[first_row:first_row + self.chunk_tiles,
+                                 first_column:first_column + self.chunk_tiles]
+        blocks = []
+        for row, column in zip(*np.nonzero(tiles == level.BLOCK)):
+            block = self.make_block(first_column + int(column), first_row + int(row))
+            self.grid.add(block)
+            blocks.append(block)
+        self.loaded[key] = blocks
+
+        for column, row in self.spawns.pop(key, []):
+            self.add_enemy(self.make_enemy(column, row))
+
+    def unload(self, key, blocks):
+        for block in blocks:
+            self.grid.discard(block)
+
+    def add_enemy(self, enemy):
+        key = self.chunk_of(enemy.rect)
+        self.enemies.setdefault(key, OrderedDict())[enemy] = None
+        self.enemy_chunk[enemy] = key
+
+    def remove_enemy(self, enemy):
+        del self.enemies[self.enemy_chunk.pop(enemy)][enemy]
+
+    def moved(self, enemy):
+        key = self.chunk_of(enemy.rect)
+        if key != self.enemy_chunk[enemy]:
+            self.remove_enemy(enemy)
+            self.add_enemy(enemy)
+
+    def active_enemies(self):
+        enemies = []
+        for key in self.active:
+            enemies.extend(self.enemies.get(key, ()))
+        return enemies
+
+    def enemies_in(self, rect, margin=settings.TILE_SIZE):
+        """Enemies in the chunks under rect, grown by margin for enemies
+        whose centre is just outside it."""
+        rect = rect.inflate(2 * margin, 2 * margin)
+        size = self.chunk_size
+        enemies = []
+        for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+            for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                enemies.extend(self.enemies.get((cx, cy), ()))
+        return enemies